@@ -0,0 +1,141 @@
+import os
+import json
+import pickle
+from os import path
+from shutil import rmtree
+from hashlib import blake2b
+from tempfile import mkdtemp, NamedTemporaryFile
+
+def cache_directory(*names):
+    """
+    Return the path of the given cache subdirectory and create it if necessary.
+
+    The cache lives in $XDG_CACHE_HOME/fault-injection
+    or in ~/.cache/fault-injection if the variable is not set.
+    """
+
+    root = os.environ.get('XDG_CACHE_HOME') or path.join(path.expanduser('~'), '.cache')
+    directory = path.join(root, 'fault-injection', *names)
+    os.makedirs(directory, exist_ok = True)
+    return directory
+
+def write_atomically(filename, content):
+    """
+    Replace the given file with the given text without exposing partial content.
+    """
+
+    with NamedTemporaryFile('w', dir = path.dirname(filename), delete = False) as temporary_file:
+        temporary_file.write(content)
+    os.replace(temporary_file.name, filename)
+
+def read_stamps():
+    try:
+        with open(path.join(cache_directory(), 'stamps.json')) as stamps_file: return json.load(stamps_file)
+    except (IOError, ValueError): return {}
+
+def file_stamp(filename):
+    status = os.stat(filename)
+    return [status.st_size, status.st_mtime_ns]
+
+def known_digest(filename):
+    """
+    Return the remembered content hash of the given file
+    or None if the file changed since its hash was remembered.
+    """
+
+    try:
+        size, modification_time, digest = read_stamps()[path.realpath(filename)]
+        if [size, modification_time] == file_stamp(filename): return digest
+    except (KeyError, ValueError, TypeError): pass
+
+def remember_digest(filename, digest, stamp = None):
+    """
+    Remember the content hash of the given file together with its size and modification time.
+
+    The stamp should be taken before the file was read.
+    """
+
+    if stamp is None: stamp = file_stamp(filename)
+    stamps = read_stamps()
+    stamps[path.realpath(filename)] = stamp + [digest]
+    try: write_atomically(path.join(cache_directory(), 'stamps.json'), json.dumps(stamps))
+    except IOError: pass
+
+def file_digest(filename, block_size = 1 << 20):
+    """
+    Return the hexadecimal content hash of the given file.
+
+    The hash is remembered together with the size and modification time of the file,
+    so an unchanged file is only hashed once.
+    """
+
+    digest = known_digest(filename)
+    if digest is not None: return digest
+
+    stamp = file_stamp(filename)
+    content_hash = blake2b()
+    with open(filename, 'rb') as content_file:
+        for block in iter(lambda: content_file.read(block_size), b''):
+            content_hash.update(block)
+    digest = content_hash.hexdigest()
+
+    remember_digest(filename, digest, stamp)
+    return digest
+
+def cache_key(*parts):
+    """
+    Return a hexadecimal key identifying the combination of the given parts.
+    """
+
+    return blake2b(repr(parts).encode('utf8'), digest_size = 20).hexdigest()
+
+def lookup(kind, key, load):
+    """
+    Return the object cached under the given kind and key
+    read by the given function from its directory
+    or None if there is no such object.
+    """
+
+    directory = path.join(cache_directory(kind), key)
+    if path.isdir(directory):
+        try: return load(directory)
+        except (IOError, ValueError): pass
+
+def store(kind, key, result, save):
+    """
+    Cache the given object under the given kind and key.
+
+    The given function stores the object in an empty directory.
+    The directory is written completely before it is moved to its final place.
+    An object that cannot be stored, like one nested too deeply to be pickled, is not cached.
+    """
+
+    directory = path.join(cache_directory(kind), key)
+
+    try: temporary_directory = mkdtemp(dir = cache_directory(kind))
+    except OSError: return
+
+    try:
+        save(result, temporary_directory)
+        if path.isdir(directory): rmtree(directory, ignore_errors = True)
+        os.rename(temporary_directory, directory)
+    except (OSError, pickle.PicklingError, RecursionError): rmtree(temporary_directory, ignore_errors = True)
+
+def cached(kind, key, build, save, load, rebuild = False):
+    """
+    Return the object cached under the given kind and key.
+
+    Arguments:
+      build - function creating the object if it is not cached
+      save  - function storing the object in an empty directory
+      load  - function reading the object from a directory
+      rebuild - ignore and replace an existing cache entry
+    """
+
+    if not rebuild:
+        result = lookup(kind, key, load)
+        if result is not None: return result
+
+    result = build()
+    store(kind, key, result, save)
+    return result
@@ -0,0 +1,629 @@
+from os import path
+from itertools import repeat
+from collections import namedtuple
+
+import numpy
+
+def parse_integers(strings, base = 10):
+    """
+    Return an integer array and a validity mask for the given strings.
+
+    Strings that can not be read as an integer in the given base
+    get the value zero and are marked as invalid.
+    """
+
+    count = len(strings)
+    try:
+        values = numpy.fromiter(map(int, strings, repeat(base)), numpy.int64, count)
+        return values, numpy.ones(count, bool)
+    except (ValueError, TypeError, OverflowError): pass
+
+    # slow path: at least one string is not a valid integer
+    values = numpy.zeros(count, numpy.int64)
+    valid  = numpy.zeros(count, bool)
+    for index, string in enumerate(strings):
+        try: values[index] = int(string, base)
+        except (ValueError, TypeError, OverflowError): continue
+        valid[index] = True
+    return values, valid
+
+def last_occurrences(*keys):
+    """
+    Return the indices sorting the given key arrays lexicographically,
+    keeping only the last occurrence of equal keys.
+
+    The first key is the most significant one.
+    This mirrors the semantics of repeatedly assigning to a sorted dictionary:
+    the last written value for a key wins.
+    """
+
+    # lexsort is stable and sorts by the last key first
+    order = numpy.lexsort(keys[::-1])
+    if not len(order): return order
+
+    # an element is superseded if all keys equal those of its successor
+    superseded = numpy.ones(len(order), bool)
+    superseded[-1] = False
+    for key in keys:
+        sorted_key = key[order]
+        superseded[:-1] &= sorted_key[1:] == sorted_key[:-1]
+    return order[~superseded]
+
+def experiment_keys(positions, starts, ends):
+    """
+    Return the structured array of the bit positions, starts and ends of experiments,
+    which compares lexicographically, e.g. in searchsorted.
+    """
+
+    keys = numpy.empty(len(positions), [('position', numpy.int64), ('start', numpy.int64), ('end', numpy.int64)])
+    keys['position'], keys['start'], keys['end'] = positions, starts, ends
+    return keys
+
+def concatenated_ranges(lowers, uppers):
+    """
+    Return the array of all indices from each lower bound up to the corresponding upper bound in order.
+    """
+
+    lengths = uppers - lowers
+    return numpy.repeat(lowers - (numpy.cumsum(lengths) - lengths), lengths) + numpy.arange(lengths.sum())
+
+def record_boundary(data, quotes = 0):
+    """
+    Return the length of the longest prefix of the given csv bytes
+    ending at a record boundary.
+
+    A record boundary is a newline outside of quoted fields.
+    Quotes inside quoted fields are doubled,
+    so a newline is outside exactly if an even number of quotes precede it.
+    The data has to start at a record boundary
+    unless the number of quotes preceding it is given.
+    """
+
+    quotes += data.count(b'"')
+    end = len(data)
+    while True:
+        newline = data.rfind(b'\n', 0, end)
+        if newline < 0: return 0
+        quotes -= data.count(b'"', newline, end)
+        if not quotes % 2: return newline + 1
+        end = newline
+
+def record_blocks(binary_file, block_size, end = None):
+    """
+    Yield blocks of about the given size from the file,
+    each consisting of complete csv records.
+
+    The file has to be positioned at a record boundary.
+    Stop at the given end offset, which has to be a record boundary too,
+    or at the end of the file.
+    A record longer than the block size is yielded as a block of its own.
+    """
+
+    def read():
+        if end is None: return binary_file.read(block_size)
+        return binary_file.read(max(min(block_size, end - binary_file.tell()), 0))
+
+    rest = b''
+    for block in iter(read, b''):
+        data = rest + block
+        boundary = record_boundary(data)
+        if boundary: yield data[:boundary]
+        rest = data[boundary:]
+    if rest: yield rest
+
+def first_record_end(binary_file, block_size = 1 << 16):
+    """
+    Return the offset of the end of the first record of the file, e.g. the header,
+    reading only as much of the file as necessary.
+    """
+
+    binary_file.seek(0)
+    data = b''
+    for block in iter(lambda: binary_file.read(block_size), b''):
+        data += block
+        newline = data.find(b'\n', len(data) - len(block))
+        while newline >= 0:
+            if not data.count(b'"', 0, newline) % 2: return newline + 1
+            newline = data.find(b'\n', newline + 1)
+    return len(data)
+
+def record_offsets(binary_file, count, block_size = 1 << 24, content_hash = None):
+    """
+    Return a list of offsets splitting the file into about count ranges
+    of complete csv records.
+
+    The first offset is the end of the first record, the header,
+    and the last offset is the size of the file.
+    The file is read once to track which newlines lie outside of quoted fields.
+    The content is fed into the optional content hash on the way.
+    """
+
+    binary_file.seek(0, 2)
+    size = binary_file.tell()
+    binary_file.seek(0)
+
+    targets = [size * number // count for number in range(count)]
+    offsets = []
+    quotes = 0
+    position = 0
+
+    for block in iter(lambda: binary_file.read(block_size), b''):
+        if content_hash is not None: content_hash.update(block)
+
+        while targets:
+            # the first newline at or after the target outside of quoted fields
+            search = max(targets[0] - position, 0)
+            parity = quotes + block.count(b'"', 0, search)
+            newline = block.find(b'\n', search)
+            while newline >= 0:
+                parity += block.count(b'"', search, newline)
+                if not parity % 2: break
+                search = newline
+                newline = block.find(b'\n', newline + 1)
+            if newline < 0: break
+
+            offsets.append(position + newline + 1)
+            while targets and targets[0] < offsets[-1]: targets.pop(0)
+
+        quotes += block.count(b'"')
+        position += len(block)
+
+    if not offsets or offsets[-1] < size: offsets.append(size)
+    return offsets
+
+MergeReport = namedtuple('MergeReport', ['duplicates', 'conflicts', 'overlaps'])
+
+def merge_campaigns(campaigns):
+    """
+    Return the campaign combining the given campaigns and a report of their overlaps.
+
+    The experiments of all campaigns are merged by bit position and time.
+    Experiments found in several campaigns are resolved
+    in favour of the last campaign, just like duplicates within one campaign.
+    The report counts experiments of different campaigns:
+      duplicates - same bit position and interval with the same result
+      conflicts  - same bit position and interval with different results
+      overlaps   - experiments overlapping an experiment of another campaign
+                   at the same bit position with a different interval,
+                   counted once for each other campaign
+    """
+
+    parts = [campaign.to_columns() for campaign in campaigns]
+    columns = concatenate_columns(parts)
+    shards = numpy.concatenate([numpy.full(len(part['positions']), number, numpy.int64)
+                                for number, part in enumerate(parts)] or [numpy.zeros(0, numpy.int64)])
+
+    # every campaign is sorted already, the stable sort merges these runs
+    order = numpy.lexsort((shards, columns['ends'], columns['starts'], columns['positions']))
+    positions, starts, ends, results, shards = (array[order] for array in
+        (columns['positions'], columns['starts'], columns['ends'], columns['results'], shards))
+
+    same_position = positions[1:] == positions[:-1]
+    same_interval = same_position & (starts[1:] == starts[:-1]) & (ends[1:] == ends[:-1])
+    other_shard = shards[1:] != shards[:-1]
+    same_result = results[1:] == results[:-1]
+
+    report = MergeReport(
+        duplicates = int(numpy.count_nonzero(same_interval & other_shard & same_result)),
+        conflicts  = int(numpy.count_nonzero(same_interval & other_shard & ~same_result)),
+        overlaps   = count_overlaps(positions, starts, ends, shards, len(parts), same_position, same_interval))
+
+    columns.update(positions = positions, starts = starts, ends = ends, results = results)
+    return Campaign(**columns), report
+
+def count_overlaps(positions, starts, ends, shards, shard_count, same_position, same_interval):
+    """
+    Return the number of experiments overlapping an earlier experiment of another shard
+    at the same bit position with a different interval, counted once for each other shard.
+
+    The experiments have to be sorted by bit position and interval.
+    The earlier experiments overlap an experiment if the maximum of their ends
+    at the same bit position is after its start, so only this running maximum is tracked for each shard.
+    """
+
+    count = len(positions)
+    if not count: return 0
+
+    # the ends are replaced by their ranks, which are offset by the position group,
+    # so a single running maximum restarts at each bit position
+    unique_ends = numpy.unique(ends)
+    ranks = numpy.searchsorted(unique_ends, ends) + 1
+    groups = numpy.cumsum(numpy.append(False, ~same_position))
+    base = groups * (len(unique_ends) + 1)
+
+    # the experiments before the first one with the same interval have different intervals
+    indices = numpy.arange(count)
+    block_starts = numpy.maximum.accumulate(numpy.where(numpy.append(True, ~same_interval), indices, 0))
+    previous = block_starts - 1
+
+    overlaps = 0
+    for shard in range(shard_count):
+        maxima = numpy.maximum.accumulate(numpy.where(shards == shard, base + ranks, base))
+        earlier = numpy.where(previous >= 0, maxima[numpy.maximum(previous, 0)] - base, 0)
+        earlier_ends = unique_ends[numpy.maximum(earlier - 1, 0)]
+        overlaps += int(numpy.count_nonzero((shards != shard) & (earlier > 0) & (earlier_ends > starts)))
+    return overlaps
+
+def concatenate_columns(parts):
+    """
+    Return the column dictionary combining the given column dictionaries in order.
+    """
+
+    columns = {}
+    for name in Campaign.columns:
+        arrays = [part[name] for part in parts]
+        if arrays: columns[name] = numpy.concatenate(arrays)
+        else: columns[name] = numpy.zeros(0, numpy.int64)
+    return columns
+
+class Campaign(object):
+    """
+    Compact columnar representation of the results of a fault injection campaign.
+
+    The experiments are stored in arrays sorted by bit position and time:
+      positions - bit position of the injection
+      starts    - first time of the injection interval
+      ends      - time after the injection interval
+      results   - result constant of the experiment
+    The trace is stored in the arrays trace_times and trace_pointers
+    sorted by time.
+
+    Duplicate experiments and duplicate trace times
+    are resolved in favour of the last one in the input.
+    """
+
+    # version of the stored format, increase on incompatible changes
+    version = 1
+    columns = ('positions', 'starts', 'ends', 'results', 'trace_times', 'trace_pointers')
+    arrays = columns + ('bits', 'bounds')
+
+    def __init__(self, positions, starts, ends, results, trace_times, trace_pointers):
+        order = last_occurrences(positions, starts, ends)
+        self.positions = positions[order]
+        self.starts    = starts[order]
+        self.ends      = ends[order]
+        self.results   = results[order].astype(numpy.uint8)
+
+        order = last_occurrences(trace_times)
+        self.trace_times    = trace_times[order]
+        self.trace_pointers = trace_pointers[order]
+
+        # the distinct bit positions and the bounds of their experiments
+        self.bits, first = numpy.unique(self.positions, return_index = True)
+        self.bounds = numpy.append(first, len(self.positions))
+
+    def to_columns(self):
+        """
+        Return the dictionary of the columns the campaign was built from.
+        """
+
+        return { name : getattr(self, name) for name in Campaign.columns }
+
+    def save(self, directory):
+        """
+        Store the arrays of the campaign as separate files in the given directory.
+        """
+
+        for name in Campaign.arrays:
+            numpy.save(path.join(directory, name + '.npy'), getattr(self, name))
+
+    @classmethod
+    def load(self_class, directory):
+        """
+        Return the campaign stored in the given directory.
+
+        The arrays are memory-mapped instead of read.
+        """
+
+        campaign = self_class.__new__(self_class)
+        for name in Campaign.arrays:
+            setattr(campaign, name, numpy.load(path.join(directory, name + '.npy'), mmap_mode = 'r'))
+        return campaign
+
+    def insert(self, other):
+        """
+        Return the campaign with the experiments and the trace of the other campaign inserted
+        and the sorted array of the indices of the inserted experiments in it.
+
+        Experiments and trace times of the other campaign replace equal ones,
+        as if its records followed in the input.
+        Only the experiments on the bit positions of the other campaign are searched,
+        the arrays are not sorted again.
+        """
+
+        campaign = Campaign.__new__(Campaign)
+
+        # the experiments on the bit positions of the other campaign
+        found = numpy.searchsorted(self.bits, other.bits)
+        present = found < len(self.bits)
+        present[present] = self.bits[found[present]] == other.bits[present]
+        lowers = self.bounds[found]
+        uppers = numpy.where(present, self.bounds[numpy.minimum(found + 1, len(self.bits))], lowers)
+        gathered = concatenated_ranges(lowers, uppers)
+        lengths = uppers - lowers
+        # from the index among the gathered experiments to the index in the campaign
+        shifts = lowers - (numpy.cumsum(lengths) - lengths)
+
+        # the place of each new experiment among those on its bit position
+        keys = experiment_keys(self.positions[gathered], self.starts[gathered], self.ends[gathered])
+        other_keys = experiment_keys(other.positions, other.starts, other.ends)
+        first = numpy.searchsorted(keys, other_keys)
+        replaced = numpy.searchsorted(keys, other_keys, 'right') > first
+        points = first + numpy.repeat(shifts, numpy.diff(other.bounds))
+
+        results = numpy.array(self.results)
+        results[points[replaced]] = other.results[replaced]
+        points, inserted = points[~replaced], ~replaced
+        campaign.positions = numpy.insert(self.positions, points, other.positions[inserted])
+        campaign.starts    = numpy.insert(self.starts,    points, other.starts   [inserted])
+        campaign.ends      = numpy.insert(self.ends,      points, other.ends     [inserted])
+        campaign.results   = numpy.insert(results,        points, other.results  [inserted])
+
+        campaign.bits = numpy.union1d(self.bits, other.bits)
+        counts = numpy.zeros(len(campaign.bits), numpy.int64)
+        counts[numpy.searchsorted(campaign.bits, self.bits)] = numpy.diff(self.bounds)
+        numpy.add.at(counts, numpy.searchsorted(campaign.bits, other.positions[inserted]), 1)
+        campaign.bounds = numpy.append(0, numpy.cumsum(counts))
+
+        # the trace usually continues after the known one
+        first = numpy.searchsorted(self.trace_times, other.trace_times)
+        replaced = numpy.searchsorted(self.trace_times, other.trace_times, 'right') > first
+        trace_pointers = numpy.array(self.trace_pointers)
+        trace_pointers[first[replaced]] = other.trace_pointers[replaced]
+        campaign.trace_times    = numpy.insert(self.trace_times, first[~replaced], other.trace_times[~replaced])
+        campaign.trace_pointers = numpy.insert(trace_pointers,   first[~replaced], other.trace_pointers[~replaced])
+
+        return campaign, points + numpy.arange(len(points))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, position):
+        index = numpy.searchsorted(self.bits, position)
+        return index < len(self.bits) and self.bits[index] == position
+
+    def keys(self):
+        return self.bits.tolist()
+
+    def runs(self, position):
+        """
+        Return a list of (start, end, result) triples
+        of all experiments for the given bit position.
+        """
+
+        index = numpy.searchsorted(self.bits, position)
+        if index == len(self.bits) or self.bits[index] != position: return []
+        lower, upper = self.bounds[index], self.bounds[index + 1]
+        return list(zip(self.starts [lower:upper].tolist(),
+                        self.ends   [lower:upper].tolist(),
+                        self.results[lower:upper].tolist()))
+
+    def trace(self):
+        """
+        Return an iterator over the time-instruction pointer-pairs of the trace.
+        """
+
+        return zip(self.trace_times.tolist(), self.trace_pointers.tolist())
+
+class Runs(object):
+    """
+    Run-length encoded experiment results per bit position.
+
+    Experiments on the same bit position with the same result
+    whose intervals follow each other without a gap are merged into one run.
+    The runs of all bit positions are stored in contiguous arrays
+    sorted by bit position and start:
+      starts  - first time of the run
+      ends    - time after the run
+      results - result constant of the run
+    The runs of the bit position bits[index] are those
+    from offsets[index] up to offsets[index + 1].
+
+    Slicing with bit positions returns the runs of a range of bit positions
+    sharing the arrays of the original.
+    """
+
+    __slots__ = ('bits', 'offsets', 'starts', 'ends', 'results')
+
+    def __init__(self, bits, offsets, starts, ends, results):
+        self.bits    = bits
+        self.offsets = offsets
+        self.starts  = starts
+        self.ends    = ends
+        self.results = results
+
+    @classmethod
+    def from_campaign(self_class, campaign):
+        """
+        Return the runs of the experiments of the given campaign.
+        """
+
+        positions, starts, ends, results = campaign.positions, campaign.starts, campaign.ends, campaign.results
+
+        # an experiment continues the run of its predecessor
+        # if it is on the same bit position, has the same result and starts where the predecessor ends
+        continues = numpy.zeros(len(positions), bool)
+        continues[1:] = (positions[1:] == positions[:-1]) & (results[1:] == results[:-1]) & (starts[1:] == ends[:-1])
+        heads = numpy.flatnonzero(~continues)
+        lasts = numpy.append(heads[1:], len(positions)) - 1
+
+        bits, first = numpy.unique(positions[heads], return_index = True)
+        return self_class(bits, numpy.append(first, len(heads)),
+                          numpy.array(starts[heads]), numpy.array(ends[lasts]), numpy.array(results[heads], numpy.uint8))
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __iter__(self):
+        return iter(self.bits.tolist())
+
+    def __contains__(self, position):
+        index = numpy.searchsorted(self.bits, position)
+        return index < len(self.bits) and self.bits[index] == position
+
+    def __getitem__(self, positions):
+        """
+        Return the runs of the bit positions in the given slice.
+        """
+
+        if not isinstance(positions, slice) or positions.step is not None:
+            raise TypeError('Runs: only bit position ranges can be selected')
+
+        lower = 0 if positions.start is None else numpy.searchsorted(self.bits, positions.start)
+        upper = len(self.bits) if positions.stop is None else numpy.searchsorted(self.bits, positions.stop)
+        upper = max(lower, upper)
+        first, last = self.offsets[lower], self.offsets[upper]
+
+        return Runs(self.bits[lower:upper], self.offsets[lower:upper + 1] - first,
+                    self.starts[first:last], self.ends[first:last], self.results[first:last])
+
+    def keys(self):
+        return self.bits.tolist()
+
+    def items(self):
+        """
+        Return an iterator over the pairs of bit positions and their runs.
+        """
+
+        starts, ends, results = self.starts.tolist(), self.ends.tolist(), self.results.tolist()
+        offsets = self.offsets.tolist()
+        return ((position, list(zip(starts [offsets[index] : offsets[index + 1]],
+                                    ends   [offsets[index] : offsets[index + 1]],
+                                    results[offsets[index] : offsets[index + 1]])))
+                for index, position in enumerate(self.bits.tolist()))
+
+    def runs(self, position):
+        """
+        Return a list of (start, end, result) triples
+        of all runs for the given bit position.
+        """
+
+        index = numpy.searchsorted(self.bits, position)
+        if index == len(self.bits) or self.bits[index] != position: return []
+        lower, upper = self.offsets[index], self.offsets[index + 1]
+        return list(zip(self.starts [lower:upper].tolist(),
+                        self.ends   [lower:upper].tolist(),
+                        self.results[lower:upper].tolist()))
+
+    def result(self, position, time):
+        """
+        Return the result of the run of the bit position covering the given time
+        or None if there is no such run.
+
+        Of overlapping runs the one starting last is chosen.
+        """
+
+        index = numpy.searchsorted(self.bits, position)
+        if index == len(self.bits) or self.bits[index] != position: return None
+        lower, upper = self.offsets[index], self.offsets[index + 1]
+
+        # the runs starting at or before the time, the last one usually covers it
+        before = lower + numpy.searchsorted(self.starts[lower:upper], time, 'right')
+        if before > lower and self.ends[before - 1] > time: return int(self.results[before - 1])
+
+        # otherwise a longer run starting earlier may still cover it
+        covering = numpy.flatnonzero(self.ends[lower:before] > time)
+        if not len(covering): return None
+        return int(self.results[lower + covering[-1]])
+
+def running_maxima(ends, bounds):
+    """
+    Return the running maxima of the ends, restarting at each of the given bounds.
+    """
+
+    # shift the ends of each range above those of the previous ones
+    if not len(ends): return numpy.zeros(0, numpy.int64)
+    lowest = int(ends.min())
+    span = int(ends.max()) - lowest + 1
+    if span * (len(bounds) - 1) < 1 << 62:
+        shifts = numpy.repeat(numpy.arange(len(bounds) - 1, dtype = numpy.int64) * span, numpy.diff(bounds))
+        return numpy.maximum.accumulate(ends - lowest + shifts) - shifts + lowest
+    return numpy.concatenate([numpy.maximum.accumulate(ends[lower:upper])
+                              for lower, upper in zip(bounds[:-1], bounds[1:])])
+
+class IntervalIndex(object):
+    """
+    Index answering which experiments on a range of bit positions
+    intersect a window of time.
+
+    The experiments of each bit position are sorted by start already.
+    Additionally the running maximum of their ends is kept per bit position,
+    so the first experiment which can reach into a window is found by bisection too.
+    A query takes logarithmic time per bit position plus the size of its output
+    as long as the experiments of a bit position hardly overlap.
+
+    The runs of a campaign can be indexed instead of its experiments,
+    each experiment covering a time belongs to exactly one run covering it.
+    """
+
+    __slots__ = ('bits', 'bounds', 'starts', 'ends', 'reaches')
+
+    def __init__(self, bits, bounds, starts, ends):
+        self.bits   = bits
+        self.bounds = bounds
+        self.starts = starts
+        self.ends   = ends
+
+        self.reaches = running_maxima(self.ends, self.bounds)
+
+    @classmethod
+    def from_campaign(self_class, campaign):
+        """
+        Return the index of the experiments of the given campaign.
+        """
+
+        return self_class(campaign.bits, campaign.bounds, campaign.starts, campaign.ends)
+
+    @classmethod
+    def from_runs(self_class, runs):
+        """
+        Return the index of the given runs.
+        """
+
+        return self_class(runs.bits, runs.offsets, runs.starts, runs.ends)
+
+    def inserted(self, campaign, indices):
+        """
+        Return the index of the given campaign,
+        which is the indexed one with the experiments at the given sorted indices inserted
+        or replaced by experiments with the same intervals.
+
+        Only the running maxima of the bit positions of the inserted experiments are computed again.
+        """
+
+        index = IntervalIndex.__new__(IntervalIndex)
+        index.bits, index.bounds, index.starts, index.ends = campaign.bits, campaign.bounds, campaign.starts, campaign.ends
+        index.reaches = numpy.insert(self.reaches, indices - numpy.arange(len(indices)), campaign.ends[indices])
+
+        touched = numpy.unique(numpy.searchsorted(campaign.bits, campaign.positions[indices]))
+        lowers, uppers = campaign.bounds[touched], campaign.bounds[touched + 1]
+        gathered = concatenated_ranges(lowers, uppers)
+        index.reaches[gathered] = running_maxima(campaign.ends[gathered], numpy.append(0, numpy.cumsum(uppers - lowers)))
+        return index
+
+    def query(self, lower, upper, start, end):
+        """
+        Return the sorted array of the indices of all experiments
+        on the bit positions from lower up to upper
+        intersecting the times from start up to end.
+        """
+
+        first_bit, last_bit = numpy.searchsorted(self.bits, (lower, upper))
+        found = []
+        for bound, next_bound in zip(self.bounds[first_bit:last_bit].tolist(), self.bounds[first_bit + 1:last_bit + 1].tolist()):
+            # the experiments starting before the end of the window
+            last = bound + int(numpy.searchsorted(self.starts[bound:next_bound], end))
+            # skip those which can not reach into the window
+            first = bound + int(numpy.searchsorted(self.reaches[bound:last], start, 'right'))
+            if first < last: found.append(first + numpy.flatnonzero(self.ends[first:last] > start))
+
+        if not found: return numpy.zeros(0, numpy.int64)
+        return numpy.concatenate(found)
+
+    def covering(self, position, time):
+        """
+        Return the sorted array of the indices of all experiments
+        on the bit position covering the given time.
+        """
+
+        return self.query(position, position + 1, time, time + 1)
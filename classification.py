@@ -0,0 +1,226 @@
+import re
+import csv
+from os import path
+from hashlib import blake2b
+from collections import namedtuple, Counter
+from operator import attrgetter
+
+import numpy
+
+Rule = namedtuple('Rule', ['priority', 'result', 'pattern'])
+
+class Classifier(object):
+    """
+    Table driven classification of experiment outputs.
+
+    Each rule maps a regular expression to a result constant.
+    All rules are compiled into one alternation,
+    so a single scan over an output finds the rules matching in it.
+    Of those the rule with the smallest priority decides the result.
+    The expressions must not refer to groups by number.
+
+    Experiments of the result type 'DONE' are correct without looking at the output.
+    If no rule matches, the result type 'WRONG' means a wrong result
+    and everything else another error.
+
+    Many experiments fail with exactly the same output.
+    Each distinct output is matched only once:
+    the memo maps the hashes of known outputs to their rule numbers
+    and can be stored to be reused by later runs with the same rules.
+    The outputs themselves are only kept if asked for.
+    """
+
+    def __init__(self, rules, result_class, keep_outputs = False):
+        self.rules = sorted(rules, key = attrgetter('priority'))
+        self.result_class = result_class
+
+        # the rule results indexed by rule number
+        self.results = numpy.array([rule.result for rule in self.rules], numpy.uint8)
+        self.expressions = [re.compile(rule.pattern) for rule in self.rules]
+
+        # scanners[number] finds the next position where any rule
+        # more important than the rule with the given number matches
+        # non-capturing alternatives keep the fast literal prefix search of the re module
+        self.scanners = [re.compile('|'.join('(?:{})'.format(rule.pattern) for rule in self.rules[:number]))
+                         for number in range(len(self.rules) + 1)]
+
+        # number of outputs decided by each rule, None counts unmatched outputs
+        self.hits = Counter()
+
+        # hash of an output to the number of the rule matching it or None
+        self.memo = {}
+        # the part of the memo not stored yet
+        self.learned = {}
+
+        # hash of an output to the output and its number of occurrences
+        if keep_outputs: self.outputs = {}
+        else: self.outputs = None
+
+    def match(self, output):
+        """
+        Return the number of the most important rule matching the output
+        or None if no rule matches.
+
+        Scan the output once with the combined expression of all rules.
+        After each hit continue scanning only for rules more important
+        than the best one found so far.
+        """
+
+        best = len(self.rules)
+        position = 0
+        while best:
+            match = self.scanners[best].search(output, position)
+            if match is None: break
+            position = match.start()
+            for number in range(best):
+                if self.expressions[number].match(output, position):
+                    best = number
+                    break
+            position += 1
+
+        if best == len(self.rules): return None
+        return best
+
+    def remember(self, output):
+        """
+        Return the number of the most important rule matching the output
+        or None if no rule matches.
+
+        Look the output up in the memo by its hash
+        and match it only if it is not known yet.
+        """
+
+        digest = blake2b(output.encode('utf8', 'replace'), digest_size = 16).digest()
+        try: number = self.memo[digest]
+        except KeyError:
+            number = self.memo[digest] = self.learned[digest] = self.match(output)
+
+        if self.outputs is not None:
+            self.outputs[digest] = output, self.outputs.get(digest, (None, 0))[1] + 1
+        return number
+
+    def update(self, hits, learned, outputs = None):
+        """
+        Add the rule hits, the memo entries and the outputs
+        collected by a copy of the classifier.
+        """
+
+        self.hits.update(hits)
+        self.memo.update(learned)
+        self.learned.update(learned)
+        if self.outputs is not None and outputs is not None:
+            for digest, (output, count) in outputs.items():
+                self.outputs[digest] = output, self.outputs.get(digest, (None, 0))[1] + count
+
+    def reset(self):
+        """
+        Forget the rule hits, the new memo entries and the outputs,
+        but keep the memo itself.
+        """
+
+        self.hits.clear()
+        self.learned.clear()
+        if self.outputs is not None: self.outputs.clear()
+
+    def classify(self, result_types, outputs):
+        """
+        Return an array of the result constants for the given columns
+        of result types and outputs.
+        """
+
+        results = numpy.full(len(result_types), self.result_class.OK, numpy.uint8)
+        failed = numpy.flatnonzero(numpy.array(result_types, object) != 'DONE').tolist()
+
+        # identical outputs within the columns are only looked up once
+        numbers = {}
+        for index in failed:
+            output = outputs[index]
+            try: number = numbers[output]
+            except KeyError: number = numbers[output] = self.remember(output)
+            else:
+                if self.outputs is not None: self.remember(output)
+            self.hits[number] += 1
+
+            if number is not None: results[index] = self.results[number]
+            elif result_types[index] == 'WRONG': results[index] = self.result_class.WRONG
+            else: results[index] = self.result_class.OTHER_ERROR
+
+        return results
+
+    def statistics(self):
+        """
+        Return a list of rule-hit count-pairs in the order of the rules.
+
+        The last pair counts the outputs not matched by any rule with the rule None.
+        """
+
+        statistics = [(rule, self.hits[number]) for number, rule in enumerate(self.rules)]
+        statistics.append((None, self.hits[None]))
+        return statistics
+
+    def unmatched_outputs(self):
+        """
+        Return a list of output-count-pairs of the kept outputs not matched by any rule,
+        the most frequent first.
+        """
+
+        if self.outputs is None: return []
+        unmatched = [self.outputs[digest] for digest, number in self.memo.items()
+                     if number is None and digest in self.outputs]
+        return sorted(unmatched, key = lambda pair: pair[1], reverse = True)
+
+    def memo_key(self):
+        """
+        Return the parts identifying the memo of the classifier.
+
+        The memo stores rule numbers, so it is only valid for the same rules.
+        """
+
+        return 'classification memo', self.rules
+
+    def save_memo(self, directory):
+        """
+        Store the memo in the given directory.
+        """
+
+        # raw bytes, a byte string array would strip trailing zero bytes
+        digests = numpy.frombuffer(b''.join(self.memo), numpy.uint8).reshape(-1, 16)
+        numbers = numpy.array([-1 if number is None else number for number in self.memo.values()], numpy.int32)
+        numpy.save(path.join(directory, 'digests.npy'), digests)
+        numpy.save(path.join(directory, 'numbers.npy'), numbers)
+
+    def load_memo(self, directory):
+        """
+        Add the memo stored in the given directory to the memo of the classifier.
+        """
+
+        digests = numpy.load(path.join(directory, 'digests.npy')).tobytes()
+        numbers = numpy.load(path.join(directory, 'numbers.npy'))
+        if len(digests) != 16 * len(numbers) or numbers.max(initial = -1) >= len(self.rules):
+            raise ValueError('load_memo: inconsistent memo')
+
+        self.memo.update((digests[16 * index : 16 * index + 16], None if number < 0 else number)
+                         for index, number in enumerate(numbers.tolist()))
+        return self
+
+def read_classification_rules(filename, result_class, keep_outputs = False):
+    """
+    Return a classifier with the rules from the given csv file.
+
+    Each row of the file consists of a priority,
+    the name of the result constant and the regular expression.
+    """
+
+    rules = []
+    with open(filename, newline = '') as rules_file:
+        for line in csv.DictReader(rules_file):
+            try:
+                priority = int(line['priority'])
+                result = getattr(result_class, line['result'].strip())
+                pattern = line['pattern']
+                re.compile(pattern)
+            except (ValueError, TypeError, AttributeError, re.error) as error:
+                raise ValueError('read_classification_rules: invalid rule {}'.format(dict(line))) from error
+            rules.append(Rule(priority, result, pattern))
+
+    return Classifier(rules, result_class, keep_outputs)
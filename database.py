@@ -0,0 +1,101 @@
+import sqlite3
+from os import path
+from urllib.request import pathname2url
+
+import numpy
+
+from campaign import Campaign
+
+def create_database(filename, campaign, kind):
+    """
+    Write the given campaign into a new SQLite database with the given name.
+
+    The experiments are indexed by bit position, time and result,
+    so windows of a campaign can be loaded without reading all of it.
+    The kind of the campaign, e.g. the name of its data class, is stored along.
+    """
+
+    connection = sqlite3.connect(filename)
+    try:
+        with connection:
+            connection.executescript('''
+                DROP TABLE IF EXISTS experiments;
+                DROP TABLE IF EXISTS trace;
+                DROP TABLE IF EXISTS properties;
+                CREATE TABLE experiments (position INTEGER NOT NULL, start_time INTEGER NOT NULL,
+                                          end_time INTEGER NOT NULL, result INTEGER NOT NULL);
+                CREATE TABLE trace (time INTEGER PRIMARY KEY, pointer INTEGER NOT NULL);
+                CREATE TABLE properties (key TEXT PRIMARY KEY, value TEXT);
+            ''')
+            connection.execute('INSERT INTO properties VALUES (?, ?)', ('kind', kind))
+            connection.executemany('INSERT INTO experiments VALUES (?, ?, ?, ?)',
+                                   zip(campaign.positions.tolist(), campaign.starts.tolist(),
+                                       campaign.ends.tolist(), campaign.results.tolist()))
+            connection.executemany('INSERT INTO trace VALUES (?, ?)',
+                                   zip(campaign.trace_times.tolist(), campaign.trace_pointers.tolist()))
+
+            # create the indices after inserting, which is a lot faster
+            connection.executescript('''
+                CREATE INDEX experiments_by_position ON experiments (position, start_time);
+                CREATE INDEX experiments_by_time     ON experiments (start_time, end_time);
+                CREATE INDEX experiments_by_result   ON experiments (result, position);
+                ANALYZE;
+            ''')
+    finally: connection.close()
+
+def connect_read_only(filename):
+    return sqlite3.connect('file:{}?mode=ro'.format(pathname2url(path.abspath(filename))), uri = True)
+
+def read_database_kind(filename):
+    """
+    Return the kind of the campaign stored in the given database.
+    """
+
+    connection = None
+    try:
+        connection = connect_read_only(filename)
+        row = connection.execute("SELECT value FROM properties WHERE key = 'kind'").fetchone()
+    except sqlite3.Error as error:
+        raise ValueError('read_database_kind: not a campaign database') from error
+    finally:
+        if connection is not None: connection.close()
+
+    if row is None: raise ValueError('read_database_kind: not a campaign database')
+    return row[0]
+
+def load_database(filename, positions = None, times = None):
+    """
+    Return the campaign stored in the given database
+    restricted to the given windows.
+
+    Arguments:
+      positions - pair of the lowest and the first excluded bit position
+      times     - pair of the lowest and the first excluded time
+
+    An experiment is inside the time window if its interval intersects the window.
+    Either window may be None to not restrict the campaign in that dimension.
+    """
+
+    conditions = []
+    parameters = []
+    if positions is not None:
+        conditions.append('position >= ? AND position < ?')
+        parameters.extend(positions)
+    if times is not None:
+        conditions.append('start_time < ? AND end_time > ?')
+        parameters.extend(times[::-1])
+
+    query = 'SELECT position, start_time, end_time, result FROM experiments'
+    if conditions: query += ' WHERE ' + ' AND '.join(conditions)
+
+    trace_query = 'SELECT time, pointer FROM trace'
+    if times is not None: trace_query += ' WHERE time >= ? AND time < ?'
+
+    connection = connect_read_only(filename)
+    try:
+        experiments = numpy.array(connection.execute(query, parameters).fetchall(), numpy.int64).reshape(-1, 4)
+        trace = numpy.array(connection.execute(trace_query, times or ()).fetchall(), numpy.int64).reshape(-1, 2)
+    finally: connection.close()
+
+    return Campaign(experiments[:, 0].copy(), experiments[:, 1].copy(), experiments[:, 2].copy(), experiments[:, 3].copy(),
+                    trace[:, 0].copy(), trace[:, 1].copy())
@@ -0,0 +1,933 @@
+import struct
+from bisect import bisect
+from collections import namedtuple
+from collections.abc import Mapping
+from os import path
+
+import numpy
+
+from structures import (Data, DataEnumeration, DataStructure, DataClass, DataUnion, Array,
+                        Pointer, Reference, Function, SpecificStructure, Substructure, void)
+
+# forms of the attributes of directory and file entries
+DW_FORM_block2    = 0x03
+DW_FORM_block4    = 0x04
+DW_FORM_data2     = 0x05
+DW_FORM_data4     = 0x06
+DW_FORM_data8     = 0x07
+DW_FORM_string    = 0x08
+DW_FORM_block     = 0x09
+DW_FORM_block1    = 0x0a
+DW_FORM_data1     = 0x0b
+DW_FORM_sdata     = 0x0d
+DW_FORM_strp      = 0x0e
+DW_FORM_udata     = 0x0f
+DW_FORM_data16    = 0x1e
+DW_FORM_line_strp = 0x1f
+
+# further forms of the attributes of debugging information entries
+DW_FORM_addr           = 0x01
+DW_FORM_flag           = 0x0c
+DW_FORM_ref_addr       = 0x10
+DW_FORM_ref1           = 0x11
+DW_FORM_ref2           = 0x12
+DW_FORM_ref4           = 0x13
+DW_FORM_ref8           = 0x14
+DW_FORM_ref_udata      = 0x15
+DW_FORM_indirect       = 0x16
+DW_FORM_sec_offset     = 0x17
+DW_FORM_exprloc        = 0x18
+DW_FORM_flag_present   = 0x19
+DW_FORM_strx           = 0x1a
+DW_FORM_addrx          = 0x1b
+DW_FORM_ref_sup4       = 0x1c
+DW_FORM_strp_sup       = 0x1d
+DW_FORM_ref_sig8       = 0x20
+DW_FORM_implicit_const = 0x21
+DW_FORM_loclistx       = 0x22
+DW_FORM_rnglistx       = 0x23
+DW_FORM_ref_sup8       = 0x24
+DW_FORM_strx1          = 0x25
+DW_FORM_strx4          = 0x28
+DW_FORM_addrx1         = 0x29
+DW_FORM_addrx4         = 0x2c
+DW_FORM_GNU_addr_index = 0x1f01
+DW_FORM_GNU_str_index  = 0x1f02
+DW_FORM_GNU_ref_alt    = 0x1f20
+DW_FORM_GNU_strp_alt   = 0x1f21
+
+# tags of debugging information entries
+DW_TAG_array_type            = 0x01
+DW_TAG_class_type            = 0x02
+DW_TAG_enumeration_type      = 0x04
+DW_TAG_formal_parameter      = 0x05
+DW_TAG_member                = 0x0d
+DW_TAG_pointer_type          = 0x0f
+DW_TAG_reference_type        = 0x10
+DW_TAG_compile_unit          = 0x11
+DW_TAG_structure_type        = 0x13
+DW_TAG_subroutine_type       = 0x15
+DW_TAG_typedef               = 0x16
+DW_TAG_union_type            = 0x17
+DW_TAG_inheritance           = 0x1c
+DW_TAG_subrange_type         = 0x21
+DW_TAG_base_type             = 0x24
+DW_TAG_const_type            = 0x26
+DW_TAG_variable              = 0x34
+DW_TAG_volatile_type         = 0x35
+DW_TAG_restrict_type         = 0x37
+DW_TAG_namespace             = 0x39
+DW_TAG_partial_unit          = 0x3c
+DW_TAG_rvalue_reference_type = 0x42
+DW_TAG_atomic_type           = 0x47
+
+# attributes of debugging information entries
+DW_AT_sibling              = 0x01
+DW_AT_location             = 0x02
+DW_AT_name                 = 0x03
+DW_AT_byte_size            = 0x0b
+DW_AT_bit_offset           = 0x0c
+DW_AT_bit_size             = 0x0d
+DW_AT_lower_bound          = 0x22
+DW_AT_upper_bound          = 0x2f
+DW_AT_count                = 0x37
+DW_AT_data_member_location = 0x38
+DW_AT_declaration          = 0x3c
+DW_AT_external             = 0x3f
+DW_AT_specification        = 0x47
+DW_AT_type                 = 0x49
+DW_AT_signature            = 0x69
+DW_AT_data_bit_offset      = 0x6b
+DW_AT_linkage_name         = 0x6e
+DW_AT_str_offsets_base     = 0x72
+DW_AT_MIPS_linkage_name    = 0x2007
+
+# unit types of version 5 unit headers
+DW_UT_type          = 0x02
+DW_UT_skeleton      = 0x04
+DW_UT_split_compile = 0x05
+DW_UT_split_type    = 0x06
+
+# operation of location expressions adding a constant
+DW_OP_plus_uconst = 0x23
+
+# content types of directory and file entries
+DW_LNCT_path            = 1
+DW_LNCT_directory_index = 2
+
+# standard opcodes of line number programs
+DW_LNS_copy             = 1
+DW_LNS_advance_pc       = 2
+DW_LNS_advance_line     = 3
+DW_LNS_set_file         = 4
+DW_LNS_const_add_pc     = 8
+DW_LNS_fixed_advance_pc = 9
+
+# extended opcodes of line number programs
+DW_LNE_end_sequence = 1
+DW_LNE_set_address  = 2
+DW_LNE_define_file  = 3
+
+class Reader(object):
+    """
+    Sequential reader of the values in a DWARF section.
+    """
+
+    def __init__(self, data, order, position = 0):
+        self.data = data
+        self.order = order
+        self.position = position
+
+    def unpack(self, value_format):
+        values = struct.unpack_from(self.order + value_format, self.data, self.position)
+        self.position += struct.calcsize(self.order + value_format)
+        return values
+
+    def integer(self, size):
+        value = int.from_bytes(self.data[self.position : self.position + size],
+                               'little' if self.order == '<' else 'big')
+        self.position += size
+        return value
+
+    def unsigned(self):
+        result = shift = 0
+        while True:
+            byte = self.data[self.position]
+            self.position += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80: return result
+
+    def signed(self):
+        result = shift = 0
+        while True:
+            byte = self.data[self.position]
+            self.position += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                if byte & 0x40: result -= 1 << shift
+                return result
+
+    def string(self):
+        end = self.data.index(b'\0', self.position)
+        value = self.data[self.position:end].decode('utf8', 'replace')
+        self.position = end + 1
+        return value
+
+def string_at(data, offset):
+    if data is None: return ''
+    return data[offset : data.index(b'\0', offset)].decode('utf8', 'replace')
+
+def read_form(reader, form, offset_size, strings, line_strings):
+    """
+    Return the value of the given form at the position of the reader.
+    """
+
+    if form == DW_FORM_string:    return reader.string()
+    if form == DW_FORM_line_strp: return string_at(line_strings, reader.integer(offset_size))
+    if form == DW_FORM_strp:      return string_at(strings, reader.integer(offset_size))
+    if form == DW_FORM_udata:     return reader.unsigned()
+    if form == DW_FORM_sdata:     return reader.signed()
+    if form == DW_FORM_data1:     return reader.integer(1)
+    if form == DW_FORM_data2:     return reader.integer(2)
+    if form == DW_FORM_data4:     return reader.integer(4)
+    if form == DW_FORM_data8:     return reader.integer(8)
+    if form == DW_FORM_data16:    return reader.integer(16)
+
+    if   form == DW_FORM_block:  length = reader.unsigned()
+    elif form == DW_FORM_block1: length = reader.integer(1)
+    elif form == DW_FORM_block2: length = reader.integer(2)
+    elif form == DW_FORM_block4: length = reader.integer(4)
+    else: raise ValueError('read_form: unsupported form 0x{:x}'.format(form))
+    value = reader.data[reader.position : reader.position + length]
+    reader.position += length
+    return value
+
+def read_entries(reader, offset_size, strings, line_strings):
+    """
+    Return the list of directory or file entries of a version 5 line table header,
+    each a dictionary from content type to value.
+    """
+
+    entry_format = [(reader.unsigned(), reader.unsigned()) for _ in range(reader.integer(1))]
+    return [{ content_type : read_form(reader, form, offset_size, strings, line_strings)
+              for content_type, form in entry_format }
+            for _ in range(reader.unsigned())]
+
+def read_line_unit_end(reader):
+    """
+    Read the length of the unit at the position of the reader of the .debug_line section.
+    Return the position of the next unit and the size of the offsets within the unit.
+    """
+
+    unit_length, = reader.unpack('I')
+    if unit_length == 0xffffffff: return reader.unpack('Q')[0] + reader.position, 8
+    return unit_length + reader.position, 4
+
+def read_line_program(data, position, order, strings, line_strings, files, rows):
+    """
+    Run the line number program of the unit at the given position of the .debug_line section.
+
+    The files is a dictionary numbering the names of the files in order of their appearance,
+    names of the unit not seen before are added to it.
+    The rows (address, file number, line) are added to the list of rows,
+    the end of a sequence has the file number -1.
+    Return the position of the next unit.
+    """
+
+    reader = Reader(data, order, position)
+    end, offset_size = read_line_unit_end(reader)
+
+    version, = reader.unpack('H')
+    if version >= 5: address_size, _ = reader.unpack('BB')
+    else: address_size = None
+    header_length = reader.integer(offset_size)
+    program = reader.position + header_length
+
+    minimum_instruction_length, = reader.unpack('B')
+    if version >= 4: reader.unpack('B') # maximum operations per instruction
+    reader.unpack('B') # default is_stmt
+    line_base, line_range, opcode_base = reader.unpack('bBB')
+    opcode_lengths = reader.unpack('{:d}B'.format(opcode_base - 1))
+
+    # the file names of the unit as numbers into the list of all files
+    if version >= 5:
+        directories = [entry.get(DW_LNCT_path, '') for entry in read_entries(reader, offset_size, strings, line_strings)]
+        entries = [(entry.get(DW_LNCT_path, ''), entry.get(DW_LNCT_directory_index, 0))
+                   for entry in read_entries(reader, offset_size, strings, line_strings)]
+        first_file = 0
+    else:
+        directories = ['']
+        while True:
+            directory = reader.string()
+            if not directory: break
+            directories.append(directory)
+        entries = []
+        while True:
+            name = reader.string()
+            if not name: break
+            entries.append((name, reader.unsigned()))
+            reader.unsigned() # modification time
+            reader.unsigned() # length
+        first_file = 1
+
+    def file_number(name, directory):
+        if directory < len(directories): name = path.join(directories[directory], name)
+        return files.setdefault(name, len(files))
+
+    numbers = [file_number(name, directory) for name, directory in entries]
+
+    def number_of(file):
+        index = file - first_file
+        if 0 <= index < len(numbers): return numbers[index]
+        return -1
+
+    reader.position = program
+    address, file, line = 0, 1, 1
+    while reader.position < end:
+        opcode = data[reader.position]
+        reader.position += 1
+
+        if opcode >= opcode_base:
+            adjusted = opcode - opcode_base
+            address += adjusted // line_range * minimum_instruction_length
+            line += line_base + adjusted % line_range
+            rows.append((address, number_of(file), line))
+
+        elif opcode == 0:
+            length = reader.unsigned()
+            next_position = reader.position + length
+            extended = data[reader.position]
+            reader.position += 1
+            if extended == DW_LNE_end_sequence:
+                rows.append((address, -1, 0))
+                address, file, line = 0, 1, 1
+            elif extended == DW_LNE_set_address:
+                address = reader.integer(address_size or length - 1)
+            elif extended == DW_LNE_define_file:
+                name = reader.string()
+                numbers.append(file_number(name, reader.unsigned()))
+            reader.position = next_position
+
+        elif opcode == DW_LNS_copy: rows.append((address, number_of(file), line))
+        elif opcode == DW_LNS_advance_pc: address += reader.unsigned() * minimum_instruction_length
+        elif opcode == DW_LNS_advance_line: line += reader.signed()
+        elif opcode == DW_LNS_set_file: file = reader.unsigned()
+        elif opcode == DW_LNS_const_add_pc: address += (255 - opcode_base) // line_range * minimum_instruction_length
+        elif opcode == DW_LNS_fixed_advance_pc: address += reader.unpack('H')[0]
+        else:
+            # skip the operands of all other standard opcodes
+            for _ in range(opcode_lengths[opcode - 1]): reader.unsigned()
+
+    return end
+
+class LineTable(object):
+    """
+    Compact index from code addresses to source lines.
+
+    The table consists of the arrays:
+      addresses    - unsigned start address of each row in ascending order
+      files        - number of the file of each row, -1 where no source line is known
+      lines        - line of each row
+      name_offsets - offsets of the file names in the name bytes, one more than files
+      names        - utf8 encoded names of all distinct files one after the other
+    A row covers the addresses up to the next row.
+    """
+
+    # version of the stored format, increase on incompatible changes
+    version = 2
+    arrays = ('addresses', 'files', 'lines', 'name_offsets', 'names')
+
+    def __init__(self, addresses, files, lines, name_offsets, names):
+        self.addresses = addresses
+        self.files = files
+        self.lines = lines
+        self.name_offsets = name_offsets
+        self.names = names
+
+    @classmethod
+    def from_rows(self_class, rows, names):
+        """
+        Return the table of the given (address, file number, line) rows
+        and the names of the files in the order of their numbers.
+
+        Of several rows at the same address the last one is kept,
+        the end of a sequence gives way to the start of another one.
+        """
+
+        if not rows: rows = [(0, -1, 0)]
+        addresses, files, lines = (numpy.array(column, numpy.int64) for column in zip(*rows))
+        addresses = addresses.astype(numpy.uint64)
+
+        order = numpy.lexsort((files >= 0, addresses))
+        sorted_addresses = addresses[order]
+        order = order[numpy.append(sorted_addresses[1:] != sorted_addresses[:-1], True)]
+
+        encoded = [name.encode('utf8') for name in names]
+        return self_class(addresses[order], files[order].astype(numpy.int32), lines[order].astype(numpy.int32),
+                          numpy.cumsum([0] + list(map(len, encoded)), dtype = numpy.int64),
+                          numpy.frombuffer(b''.join(encoded), numpy.uint8))
+
+    @classmethod
+    def from_elf(self_class, elf_file):
+        """
+        Return the table of the .debug_line section of the given ELF file.
+
+        The rows of malformed units are left out.
+        """
+
+        data = elf_file.named_section_data('.debug_line')
+        strings = elf_file.named_section_data('.debug_str')
+        line_strings = elf_file.named_section_data('.debug_line_str')
+
+        names, rows = {}, []
+        position = 0
+        while data is not None and position < len(data):
+            try: end, _ = read_line_unit_end(Reader(data, elf_file.order, position))
+            except struct.error: break
+
+            row_count = len(rows)
+            try: read_line_program(data, position, elf_file.order, strings, line_strings, names, rows)
+            except (struct.error, IndexError, ValueError): del rows[row_count:]
+            position = end
+
+        return self_class.from_rows(rows, list(names))
+
+    @classmethod
+    def merge(self_class, tables, bases):
+        """
+        Return the table combining the given tables of binaries loaded at the given base addresses.
+        """
+
+        rows, names = [], {}
+        for table, base in zip(tables, bases):
+            # the numbers of the names of the table among the names of all tables
+            numbers = numpy.array([names.setdefault(table.name(file), len(names)) for file in range(table.file_count())]
+                                  + [-1], numpy.int64)
+            rows.extend(zip((numpy.asarray(table.addresses) + numpy.uint64(base)).tolist(),
+                            numbers[numpy.asarray(table.files)].tolist(), numpy.asarray(table.lines).tolist()))
+        return self_class.from_rows(rows, list(names))
+
+    def save(self, directory):
+        """
+        Store the arrays of the table as separate files in the given directory.
+        """
+
+        for name in LineTable.arrays:
+            numpy.save(path.join(directory, name + '.npy'), getattr(self, name))
+
+    @classmethod
+    def load(self_class, directory):
+        """
+        Return the table stored in the given directory.
+
+        The arrays are memory-mapped instead of read.
+        """
+
+        return self_class(*(numpy.load(path.join(directory, name + '.npy'), mmap_mode = 'r')
+                            for name in LineTable.arrays))
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def file_count(self):
+        return len(self.name_offsets) - 1
+
+    def name(self, file):
+        """
+        Return the name of the file with the given number.
+        """
+
+        lower, upper = int(self.name_offsets[file]), int(self.name_offsets[file + 1])
+        return self.names[lower:upper].tobytes().decode('utf8', 'replace')
+
+    def rows(self, addresses):
+        """
+        Return the array of the row numbers covering the given addresses,
+        -1 for addresses without a known source line.
+        """
+
+        rows = numpy.searchsorted(self.addresses, numpy.asarray(addresses).astype(numpy.uint64), 'right') - 1
+        known = rows >= 0
+        known[known] = self.files[rows[known]] >= 0
+        rows[~known] = -1
+        return rows
+
+    def location(self, row):
+        """
+        Return the short 'file:line' description of the given row.
+        """
+
+        return '{}:{:d}'.format(path.basename(self.name(self.files[row])), int(self.lines[row]))
+
+Entry = namedtuple('Entry', ['offset', 'tag', 'attributes', 'children', 'end'])
+
+class Unit(object):
+    """
+    Header of a compilation or type unit of the debugging information.
+    """
+
+    def __init__(self, offset, end, version, address_size, offset_size, abbreviations, first_entry, type_unit):
+        self.offset = offset
+        self.end = end
+        self.version = version
+        self.address_size = address_size
+        self.offset_size = offset_size
+        self.abbreviations = abbreviations
+        self.first_entry = first_entry
+        self.type_unit = type_unit
+        self.string_offsets_base = None
+
+def read_abbreviations(data, position):
+    """
+    Return the abbreviation table at the given position of the .debug_abbrev section,
+    a dictionary from code to tag, whether the entries have children
+    and the list of (attribute, form, implicit constant) specifications.
+    """
+
+    # the table consists of bytes and LEB128 numbers only, so the byte order does not matter
+    reader = Reader(data, '<', position)
+    abbreviations = {}
+    while True:
+        code = reader.unsigned()
+        if not code: return abbreviations
+        tag = reader.unsigned()
+        children = bool(reader.integer(1))
+        specifications = []
+        while True:
+            attribute, form = reader.unsigned(), reader.unsigned()
+            if not attribute and not form: break
+            implicit = reader.signed() if form == DW_FORM_implicit_const else None
+            specifications.append((attribute, form, implicit))
+        abbreviations[code] = tag, children, specifications
+
+class DebugInfo(object):
+    """
+    Reader for the debugging information entries of an ELF file.
+
+    The sections are copied out of the file, so it may be closed afterwards.
+    Only the unit headers are read up front, the entries are read on demand.
+    Entries are identified by their offset, references are resolved to offsets.
+    """
+
+    def __init__(self, elf_file):
+        self.order = elf_file.order
+
+        # the type units of the .debug_types section follow the units of the .debug_info section,
+        # so the offsets of all entries are distinct
+        information = elf_file.named_section_data('.debug_info') or b''
+        self.data = information + (elf_file.named_section_data('.debug_types') or b'')
+        self.abbreviation_data = elf_file.named_section_data('.debug_abbrev') or b''
+        self.strings = elf_file.named_section_data('.debug_str')
+        self.line_strings = elf_file.named_section_data('.debug_line_str')
+        self.string_offsets = elf_file.named_section_data('.debug_str_offsets')
+
+        self.units = []
+        self.signatures = {}
+        abbreviations = {}
+        position = 0
+        while position < len(self.data):
+            try: position = self.read_unit(position, position >= len(information), abbreviations)
+            except (struct.error, IndexError, KeyError, ValueError): break
+        self.unit_offsets = [unit.offset for unit in self.units]
+
+        self.variable_offsets = None
+
+    def read_unit(self, position, type_unit, abbreviations):
+        """
+        Read the header of the unit at the given position and return the position of the next unit.
+
+        Arguments:
+          type_unit     - whether the unit is part of the .debug_types section
+          abbreviations - dictionary from offset to the abbreviation tables read so far
+        """
+
+        reader = Reader(self.data, self.order, position)
+        unit_length, = reader.unpack('I')
+        offset_size = 4
+        if unit_length == 0xffffffff:
+            unit_length, = reader.unpack('Q')
+            offset_size = 8
+        end = reader.position + unit_length
+
+        version, = reader.unpack('H')
+        if version >= 5:
+            unit_type, address_size = reader.unpack('BB')
+            abbreviation_offset = reader.integer(offset_size)
+        else:
+            abbreviation_offset = reader.integer(offset_size)
+            address_size, = reader.unpack('B')
+            unit_type = DW_UT_type if type_unit else None
+
+        type_unit = unit_type in (DW_UT_type, DW_UT_split_type)
+        if type_unit:
+            signature = reader.integer(8)
+            self.signatures[signature] = position + reader.integer(offset_size)
+        elif unit_type in (DW_UT_skeleton, DW_UT_split_compile): reader.position += 8 # identifier of the split unit
+
+        if abbreviation_offset not in abbreviations:
+            abbreviations[abbreviation_offset] = read_abbreviations(self.abbreviation_data, abbreviation_offset)
+
+        unit = Unit(position, end, version, address_size, offset_size,
+                    abbreviations[abbreviation_offset], reader.position, type_unit)
+        self.units.append(unit)
+
+        # indexed strings are relative to a base given by the first entry of the unit
+        root = self.entry(unit.first_entry, unit)
+        if root is not None: unit.string_offsets_base = root.attributes.get(DW_AT_str_offsets_base)
+        return end
+
+    def unit_at(self, offset):
+        """
+        Return the unit containing the given offset.
+        """
+
+        return self.units[bisect(self.unit_offsets, offset) - 1]
+
+    def read_attribute(self, reader, form, implicit, unit):
+        """
+        Return the value of the given form at the position of the reader.
+
+        References are returned as offsets of the referenced entries,
+        blocks and location expressions as bytes
+        and indices into the tables of addresses and lists as they are.
+        References into supplementary object files are returned as None.
+        """
+
+        if form == DW_FORM_indirect: return self.read_attribute(reader, reader.unsigned(), implicit, unit)
+        if form == DW_FORM_implicit_const: return implicit
+        if form == DW_FORM_flag_present: return True
+        if form == DW_FORM_flag:         return bool(reader.integer(1))
+        if form == DW_FORM_addr:         return reader.integer(unit.address_size)
+
+        if DW_FORM_ref1 <= form <= DW_FORM_ref8: return unit.offset + reader.integer(1 << (form - DW_FORM_ref1))
+        if form == DW_FORM_ref_udata:  return unit.offset + reader.unsigned()
+        if form == DW_FORM_ref_addr:   return reader.integer(unit.address_size if unit.version <= 2 else unit.offset_size)
+        if form == DW_FORM_ref_sig8:   return self.signatures.get(reader.integer(8))
+        if form == DW_FORM_sec_offset: return reader.integer(unit.offset_size)
+
+        if form in (DW_FORM_strp_sup, DW_FORM_GNU_strp_alt, DW_FORM_GNU_ref_alt): size = unit.offset_size
+        elif form == DW_FORM_ref_sup4: size = 4
+        elif form == DW_FORM_ref_sup8: size = 8
+        else: size = None
+        if size is not None:
+            reader.position += size
+            return None
+
+        if form in (DW_FORM_strx, DW_FORM_GNU_str_index): return self.indexed_string(reader.unsigned(), unit)
+        if DW_FORM_strx1 <= form <= DW_FORM_strx4:       return self.indexed_string(reader.integer(form - DW_FORM_strx1 + 1), unit)
+        if form in (DW_FORM_addrx, DW_FORM_GNU_addr_index, DW_FORM_loclistx, DW_FORM_rnglistx): return reader.unsigned()
+        if DW_FORM_addrx1 <= form <= DW_FORM_addrx4:     return reader.integer(form - DW_FORM_addrx1 + 1)
+
+        # a location expression is encoded like a block
+        if form == DW_FORM_exprloc: form = DW_FORM_block
+        return read_form(reader, form, unit.offset_size, self.strings, self.line_strings)
+
+    def indexed_string(self, index, unit):
+        if self.string_offsets is None or unit.string_offsets_base is None: return ''
+        reader = Reader(self.string_offsets, self.order, unit.string_offsets_base + index * unit.offset_size)
+        return string_at(self.strings, reader.integer(unit.offset_size))
+
+    def entry(self, offset, unit = None):
+        """
+        Return the entry at the given offset
+        or None if it is the null entry ending a list of children.
+        """
+
+        if unit is None: unit = self.unit_at(offset)
+        reader = Reader(self.data, self.order, offset)
+        code = reader.unsigned()
+        if not code: return None
+
+        tag, children, specifications = unit.abbreviations[code]
+        attributes = { attribute : self.read_attribute(reader, form, implicit, unit)
+                       for attribute, form, implicit in specifications }
+        return Entry(offset, tag, attributes, children, reader.position)
+
+    def subtree_end(self, entry, unit):
+        """
+        Return the offset following the given entry and all its descendants.
+        """
+
+        sibling = entry.attributes.get(DW_AT_sibling)
+        if sibling is not None: return sibling
+        if not entry.children: return entry.end
+
+        position = entry.end
+        while position < unit.end:
+            child = self.entry(position, unit)
+            if child is None: return position + 1
+            position = self.subtree_end(child, unit)
+        return position
+
+    def children(self, entry, unit = None):
+        """
+        Return the list of the children of the given entry.
+        """
+
+        if not entry.children: return []
+        if unit is None: unit = self.unit_at(entry.offset)
+
+        children = []
+        position = entry.end
+        while position < unit.end:
+            child = self.entry(position, unit)
+            if child is None: break
+            children.append(child)
+            position = self.subtree_end(child, unit)
+        return children
+
+    def variables(self):
+        """
+        Return the dictionary from the names of the variables stored in memory
+        to the offsets of their entries.
+
+        Only variables outside of functions are included.
+        A variable is known by its unqualified name, its name qualified by the enclosing namespaces
+        and classes and its linkage name. Of several variables with the same name the first one is kept.
+        The dictionary is built on the first call.
+        """
+
+        if self.variable_offsets is not None: return self.variable_offsets
+        self.variable_offsets = {}
+
+        # qualified names of the declarations inside namespaces
+        qualified_names = {}
+
+        def add_variables(entry, unit, scope):
+            for child in self.children(entry, unit):
+                attributes = child.attributes
+
+                if child.tag in (DW_TAG_namespace, DW_TAG_structure_type, DW_TAG_class_type, DW_TAG_union_type):
+                    name = attributes.get(DW_AT_name)
+                    add_variables(child, unit, scope + [name] if name else scope)
+                    continue
+
+                # static members of classes are declared as members before DWARF 5
+                static_member = child.tag == DW_TAG_member and DW_AT_declaration in attributes
+                if child.tag != DW_TAG_variable and not static_member: continue
+
+                name = attributes.get(DW_AT_name)
+                qualified_name = '::'.join(scope + [name]) if name and scope else None
+                if DW_AT_location not in attributes or static_member:
+                    if qualified_name: qualified_names[child.offset] = qualified_name
+                    continue
+
+                # the definition of a variable may refer to its declaration
+                # inside a namespace or class for the name
+                specification = attributes.get(DW_AT_specification)
+                if specification is not None:
+                    attributes = dict(self.entry(specification).attributes)
+                    attributes.update(child.attributes)
+                    name = attributes.get(DW_AT_name)
+                    qualified_name = qualified_names.get(specification)
+
+                names = [attributes.get(DW_AT_linkage_name), attributes.get(DW_AT_MIPS_linkage_name), qualified_name, name]
+                for name in names:
+                    if name: self.variable_offsets.setdefault(name, child.offset)
+
+        for unit in self.units:
+            if unit.type_unit: continue
+            try:
+                root = self.entry(unit.first_entry, unit)
+                if root is not None: add_variables(root, unit, [])
+            except (struct.error, IndexError, KeyError, ValueError): continue
+
+        return self.variable_offsets
+
+def member_offset(attributes):
+    """
+    Return the offset of a member given by the attributes of its entry.
+    """
+
+    location = attributes.get(DW_AT_data_member_location, 0)
+    if isinstance(location, bytes):
+        # older compilers give the offset as a location expression adding it to the address of the structure
+        if location[:1] == bytes([DW_OP_plus_uconst]): return Reader(location, '<', 1).unsigned()
+        return 0
+    if isinstance(location, int): return location
+    return 0
+
+def known_size(structure):
+    if structure.structure.size_known: return structure.structure.size
+
+class DebugStructures(Mapping):
+    """
+    Data structures of the variables of an ELF file built from its DWARF debugging information.
+
+    Maps the names of the variables to the same graph of data structures
+    as parsed from a structures file, but with the exact offsets and sizes given by the compiler.
+    The structures are built on the first lookup of a variable,
+    so only the types reachable from the variables actually used are read.
+    """
+
+    def __init__(self, debug_info):
+        self.debug_info = debug_info
+        self.types = {}
+        self.structures = {}
+
+    def __getitem__(self, name):
+        if name not in self.structures:
+            offset = self.debug_info.variables()[name]
+            try: self.structures[name] = self.variable(name, offset)
+            except (struct.error, IndexError, KeyError) as error:
+                raise ValueError('DebugStructures: malformed debugging information of {}'.format(name)) from error
+        return self.structures[name]
+
+    def __contains__(self, name):
+        return name in self.debug_info.variables()
+
+    def __iter__(self):
+        return iter(self.debug_info.variables())
+
+    def __len__(self):
+        return len(self.debug_info.variables())
+
+    def variable(self, name, offset):
+        """
+        Return the data structure of the variable with the entry at the given offset,
+        which consists of its type at offset zero like a variable of a structures file.
+        """
+
+        attributes = self.debug_info.entry(offset).attributes
+        if DW_AT_type not in attributes and DW_AT_specification in attributes:
+            attributes = self.debug_info.entry(attributes[DW_AT_specification]).attributes
+
+        structure = self.type(attributes.get(DW_AT_type))
+        variable = Data(substructures = [Substructure(structure)], size = known_size(structure))
+        # the names given by the compiler need no validation, e.g. '_Bool' or '__heap_start'
+        variable.name = name
+        return variable
+
+    def data(self, offset, data_class, name, size):
+        structure = data_class(name, size = size)
+        if name: structure.name = name
+        structure = SpecificStructure(structure)
+        self.types[offset] = structure
+        return structure
+
+    def type(self, offset, name = None):
+        """
+        Return the specific structure of the type with the entry at the given offset.
+
+        Anonymous structures, unions and enumerations take the given name, e.g. of a type definition.
+        The types are cached, the data structures are cached before their members are built,
+        so recursive types refer to themselves.
+        """
+
+        if offset is None: return SpecificStructure(void)
+        if offset in self.types: return self.types[offset]
+
+        entry = self.debug_info.entry(offset)
+        tag, attributes = entry.tag, entry.attributes
+        name = attributes.get(DW_AT_name) or name
+        size = attributes.get(DW_AT_byte_size)
+        if not isinstance(size, int): size = None
+
+        # a declaration may refer to the complete type in a type unit
+        if attributes.get(DW_AT_signature) is not None:
+            structure = self.type(attributes[DW_AT_signature], name)
+
+        elif tag in (DW_TAG_const_type, DW_TAG_volatile_type):
+            target = self.type(attributes.get(DW_AT_type), name)
+            constant = target.constant or tag == DW_TAG_const_type
+            volatile = target.volatile or tag == DW_TAG_volatile_type
+            structure = SpecificStructure(target.structure, constant, volatile)
+
+        elif tag in (DW_TAG_typedef, DW_TAG_restrict_type, DW_TAG_atomic_type):
+            structure = self.type(attributes.get(DW_AT_type), name)
+
+        elif tag in (DW_TAG_pointer_type, DW_TAG_reference_type, DW_TAG_rvalue_reference_type):
+            if size is None: size = self.debug_info.unit_at(offset).address_size
+            pointer_class = Pointer if tag == DW_TAG_pointer_type else Reference
+            structure = SpecificStructure(pointer_class(self.type(attributes.get(DW_AT_type)), size))
+
+        elif tag == DW_TAG_array_type:
+            counts = []
+            for child in self.debug_info.children(entry):
+                if child.tag != DW_TAG_subrange_type: continue
+                count = child.attributes.get(DW_AT_count)
+                upper = child.attributes.get(DW_AT_upper_bound)
+                lower = child.attributes.get(DW_AT_lower_bound, 0)
+                if not isinstance(count, int) and isinstance(upper, int) and isinstance(lower, int):
+                    count = upper - lower + 1
+                counts.append(count if isinstance(count, int) and count > 0 else 0)
+
+            structure = self.type(attributes.get(DW_AT_type))
+            for count in reversed(counts or [0]): structure = SpecificStructure(Array(structure, count))
+
+        elif tag == DW_TAG_subroutine_type:
+            function = Function(self.type(attributes.get(DW_AT_type)).structure)
+            for child in self.debug_info.children(entry):
+                if child.tag == DW_TAG_formal_parameter:
+                    function.add_argument_type(self.type(child.attributes.get(DW_AT_type)))
+            structure = SpecificStructure(function)
+
+        elif tag in (DW_TAG_structure_type, DW_TAG_class_type, DW_TAG_union_type):
+            if   tag == DW_TAG_structure_type: data_class = DataStructure
+            elif tag == DW_TAG_class_type:     data_class = DataClass
+            else:                              data_class = DataUnion
+            structure = self.data(offset, data_class, name, size)
+            self.add_members(structure.structure, entry)
+
+        elif tag == DW_TAG_enumeration_type: structure = self.data(offset, DataEnumeration, name, size)
+        else: structure = self.data(offset, Data, name, size)
+
+        self.types[offset] = structure
+        return structure
+
+    def add_members(self, structure, entry):
+        """
+        Add the members and base classes of the given entry to the data structure.
+
+        Adjacent bit fields are combined into one member covering their bytes.
+        Members overlapping a previous one, e.g. empty base classes, are left out.
+        """
+
+        members, bit_fields = [], []
+        for child in self.debug_info.children(entry):
+            if child.tag not in (DW_TAG_member, DW_TAG_inheritance): continue
+            attributes = child.attributes
+            # static members are not stored in the structure
+            if attributes.get(DW_AT_declaration) or attributes.get(DW_AT_external): continue
+
+            member = self.type(attributes.get(DW_AT_type))
+            label = attributes.get(DW_AT_name) or ''
+            offset = member_offset(attributes)
+
+            bits = attributes.get(DW_AT_bit_size)
+            if not isinstance(bits, int):
+                members.append(Substructure(member, label, offset))
+                continue
+
+            if DW_AT_data_bit_offset in attributes: start = attributes[DW_AT_data_bit_offset]
+            else:
+                # the bit offset of older compilers is counted from the most significant bit of the storage unit
+                storage = attributes.get(DW_AT_byte_size) or known_size(member) or 0
+                bit_offset = attributes.get(DW_AT_bit_offset, 0)
+                if self.debug_info.order == '<': start = offset * 8 + storage * 8 - bit_offset - bits
+                else: start = offset * 8 + bit_offset
+            bit_fields.append((start, bits, label))
+
+        groups = []
+        for start, bits, label in sorted(bit_fields):
+            lower, upper = start // 8, (start + bits + 7) // 8
+            if groups and lower < groups[-1][1]:
+                groups[-1][1] = max(groups[-1][1], upper)
+                groups[-1][2].append('{}:{:d}'.format(label, bits))
+            else: groups.append([lower, upper, ['{}:{:d}'.format(label, bits)]])
+        for lower, upper, labels in groups:
+            bit_field = Data(size = upper - lower)
+            bit_field.name = 'bitfield'
+            members.append(Substructure(SpecificStructure(bit_field), ' '.join(labels), lower))
+
+        if isinstance(structure, DataUnion):
+            for member in members: structure.add_substructure(member._replace(offset = 0))
+            return
+
+        end = 0
+        for member in sorted(members, key = lambda member: (member.offset, -(known_size(member.structure) or 0))):
+            if member.offset < end or member.offset in structure.substructures: continue
+            structure.add_substructure(member)
+            end = member.offset + (known_size(member.structure) or 0)
@@ -0,0 +1,227 @@
+import mmap
+import zlib
+import struct
+from collections import namedtuple
+from subprocess import run, PIPE, CalledProcessError
+
+Symbol = namedtuple('Symbol', ['name', 'size'])
+
+# section types
+SHT_SYMTAB = 2
+SHT_NOTE = 7
+SHT_DYNSYM = 11
+
+# note type of the GNU build id
+NT_GNU_BUILD_ID = 3
+
+# section flag of compressed sections
+SHF_COMPRESSED = 0x800
+ELFCOMPRESS_ZLIB = 1
+
+# special section indices of undefined symbols and of common symbols not allocated yet
+SHN_UNDEF = 0
+SHN_COMMON = 0xFFF2
+
+# symbol type of data objects
+STT_OBJECT = 1
+
+# symbol types not naming code or data
+STT_SECTION = 3
+STT_FILE = 4
+
+class ElfFile(object):
+    """
+    Minimal reader for the sections of an ELF32 or ELF64 file.
+
+    The file is memory-mapped, so only the parts actually used are read.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as elf_file:
+            try: self.data = mmap.mmap(elf_file.fileno(), 0, access = mmap.ACCESS_READ)
+            except ValueError: raise ValueError('ElfFile: empty file {}'.format(filename))
+
+        try:
+            if self.data[:4] != b'\x7fELF': raise ValueError('ElfFile: not an ELF file {}'.format(filename))
+            elf_class, encoding = self.data[4], self.data[5]
+            if elf_class not in (1, 2) or encoding not in (1, 2):
+                raise ValueError('ElfFile: unknown ELF class or encoding in {}'.format(filename))
+
+            self.is64 = elf_class == 2
+            self.order = '<' if encoding == 1 else '>'
+
+            # the header fields following the identification bytes
+            if self.is64: header_format, section_format = 'HHIQQQIHHHHHH', 'IIQQQQIIQQ'
+            else:         header_format, section_format = 'HHIIIIIHHHHHH', 'IIIIIIIIII'
+            header = struct.unpack_from(self.order + header_format, self.data, 16)
+            section_offset, section_entry_size, section_count, names_index = header[5], header[10], header[11], header[12]
+
+            # each section header consists of the name, type, flags, address, offset, size, link, ...
+            self.sections = [struct.unpack_from(self.order + section_format, self.data,
+                                                section_offset + number * section_entry_size)
+                             for number in range(section_count)]
+
+            if names_index < len(self.sections):
+                names = self.section_data(self.sections[names_index])
+                self.section_names = [names[section[0] : names.find(b'\0', section[0])].decode('utf8', 'replace')
+                                      for section in self.sections]
+            else: self.section_names = [''] * len(self.sections)
+        except struct.error as error:
+            self.data.close()
+            raise ValueError('ElfFile: truncated ELF file {}'.format(filename)) from error
+        except ValueError:
+            self.data.close()
+            raise
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *arguments):
+        self.close()
+
+    def section_data(self, section):
+        """
+        Return the content of the given section header.
+        """
+
+        offset, size = section[4], section[5]
+        return self.data[offset : offset + size]
+
+    def named_section_data(self, name):
+        """
+        Return the content of the section with the given name
+        or None if there is no such section.
+
+        Compressed sections are decompressed.
+        """
+
+        try: section = self.sections[self.section_names.index(name)]
+        except ValueError: return None
+
+        content = self.section_data(section)
+        if not section[2] & SHF_COMPRESSED: return content
+
+        # the compression header consists of the type, [reserved,] size and alignment
+        if self.is64: compression_type, header_size = struct.unpack_from(self.order + 'I', content)[0], 24
+        else:         compression_type, header_size = struct.unpack_from(self.order + 'I', content)[0], 12
+        if compression_type != ELFCOMPRESS_ZLIB:
+            raise ValueError('ElfFile: unknown compression of section {}'.format(name))
+        return zlib.decompress(content[header_size:])
+
+    def symbols(self, types = None):
+        """
+        Return a list of address-symbol-pairs of all defined symbols
+        naming code or data in the symbol table.
+
+        Only the symbols of the given symbol types are returned if types are given.
+        The dynamic symbol table is used if there is no full symbol table.
+        The names are not demangled.
+        """
+
+        tables = [section for section in self.sections if section[1] == SHT_SYMTAB] or \
+                 [section for section in self.sections if section[1] == SHT_DYNSYM]
+
+        symbols = []
+        for table in tables:
+            names = self.section_data(self.sections[table[6]])
+            content = self.section_data(table)
+
+            if self.is64:
+                entry_format = self.order + 'IBBHQQ'
+                entries = ((name, value, size, info, index) for name, info, _, index, value, size
+                           in struct.iter_unpack(entry_format, content[:len(content) // 24 * 24]))
+            else:
+                entry_format = self.order + 'IIIBBH'
+                entries = ((name, value, size, info, index) for name, value, size, info, _, index
+                           in struct.iter_unpack(entry_format, content[:len(content) // 16 * 16]))
+
+            for name_offset, value, size, info, index in entries:
+                if not name_offset or index in (SHN_UNDEF, SHN_COMMON) or info & 0xF in (STT_SECTION, STT_FILE): continue
+                if types is not None and info & 0xF not in types: continue
+                name = names[name_offset : names.find(b'\0', name_offset)].decode('utf8', 'replace')
+                symbols.append((value, Symbol(name, size)))
+
+        return symbols
+
+    def build_id(self):
+        """
+        Return the hexadecimal GNU build id of the file or None if it has none.
+        """
+
+        for section in self.sections:
+            if section[1] != SHT_NOTE: continue
+            notes = self.section_data(section)
+            position = 0
+            while position + 12 <= len(notes):
+                name_size, description_size, note_type = struct.unpack_from(self.order + 'III', notes, position)
+                name_start = position + 12
+                description_start = name_start + (name_size + 3) // 4 * 4
+                position = description_start + (description_size + 3) // 4 * 4
+                if note_type == NT_GNU_BUILD_ID and notes[name_start : name_start + name_size] == b'GNU\0':
+                    return notes[description_start : description_start + description_size].hex()
+
+def read_elf_symbols(filename):
+    """
+    Return a list of address-symbol-pairs of the given ELF file.
+    """
+
+    with ElfFile(filename) as elf_file: return elf_file.symbols()
+
+def read_elf_data_symbols(filename):
+    """
+    Return a list of address-symbol-pairs of the variables of the given ELF file,
+    the data objects with an address and a size.
+    """
+
+    with ElfFile(filename) as elf_file:
+        return [(address, symbol) for address, symbol in elf_file.symbols((STT_OBJECT,)) if symbol.size]
+
+def read_build_id(filename):
+    """
+    Return the GNU build id of the given ELF file
+    or None if it has none or is no ELF file.
+    """
+
+    try:
+        with ElfFile(filename) as elf_file: return elf_file.build_id()
+    except (IOError, ValueError): return None
+
+class Demangler(object):
+    """
+    Cache of demangled C++ symbol names.
+
+    Names are demangled by the tool 'c++filt' in batches.
+    If it is not available the names are kept as they are.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.available = True
+
+    def demangle_all(self, names):
+        """
+        Demangle all given names not demangled yet with a single call of 'c++filt'.
+        """
+
+        missing = sorted(set(name for name in names if name not in self.names))
+        if not missing: return
+
+        demangled = missing
+        if self.available:
+            try:
+                output = run(['c++filt'], input = '\n'.join(missing) + '\n', stdout = PIPE,
+                             universal_newlines = True, check = True).stdout.split('\n')
+                if len(output) > len(missing): demangled = output[:len(missing)]
+            except OSError: self.available = False
+            except CalledProcessError: pass
+
+        self.names.update(zip(missing, demangled))
+
+    def __call__(self, name):
+        if name not in self.names: self.demangle_all([name])
+        return self.names[name]
+
+demangle = Demangler()
@@ -6,12 +6,14 @@ from canvasvg import SVGdocument, convert
 from sortedcontainers import SortedDict
 from collections import namedtuple
 
+import numpy
+
 from grouping import Grouping, Interval
 
 class Visualisation(object):
     def __init__(self, parent, data, coloring,
                  explanation, time_labels, position_groups,
-                 location_information, mirror = True):
+                 location_information, mirror = True, detail_time_labels = ()):
 
         self.style = themed.Style()
         self.style.configure('.', background = 'white')
@@ -55,6 +57,10 @@ class Visualisation(object):
         self.time_labels.labels = SortedDict()
         self.position_labels.labels = SortedDict()
 
+        # detailed time labels are only drawn when few of them are visible
+        self.maximal_detail_labels = 100
+        self.set_detail_time_labels(detail_time_labels)
+
         self.content        .event_add('<<Inside>>', '<Enter>', '<Motion>')
         self.time_labels    .event_add('<<Inside>>', '<Enter>', '<Motion>')
         self.position_labels.event_add('<<Inside>>', '<Enter>', '<Motion>')
@@ -68,6 +74,7 @@ class Visualisation(object):
             self.hide_pointer()
             for canvas in [self.content, self.time_labels]:
                 canvas.xview(*arguments)
+            if len(self.detail_times): self.manage_time_labels()
 
         def scroll_all_vertical(*arguments):
             self.hide_pointer()
@@ -266,10 +273,48 @@ class Visualisation(object):
             self.minimal_zoom = min(float(event.width)  / self.content.width,
                                     float(event.height) / self.content.height)
 
+    def set_detail_time_labels(self, time_labels):
+        """
+        Replace the detailed time labels shown instead of the others when zoomed in.
+        """
+
+        time_labels = sorted(time_labels)
+        self.detail_times = numpy.array([time for time, _ in time_labels], numpy.int64)
+        self.detail_texts = [text for _, text in time_labels]
+
+    def show_detail_time_labels(self):
+        """
+        Draw the detailed time labels within the visible times
+        if there are not too many of them.
+
+        Return whether the labels were drawn.
+        """
+
+        self.time_labels.delete('detail')
+        if not len(self.detail_times): return False
+
+        origin_x = self.content.coords(self.content.origin)[0]
+        scale = self.content.coords(self.content.unit_point)[0] - origin_x
+        left  = (self.time_labels.canvasx(0) - origin_x) / scale
+        right = (self.time_labels.canvasx(self.time_labels.winfo_width()) - origin_x) / scale
+
+        # include the label of the line executing at the left border
+        lower, upper = numpy.searchsorted(self.detail_times, (left, right), 'right').tolist()
+        lower = max(lower - 1, 0)
+        if upper - lower > self.maximal_detail_labels: return False
+
+        for time, text in zip(self.detail_times[lower:upper].tolist(), self.detail_texts[lower:upper]):
+            self.time_labels.create_text(origin_x + time * scale, 0, text = text, tag = 'detail', anchor = 'nw')
+        return True
+
     def manage_time_labels(self, event = None):
         self.time_labels.delete('line')
         self.time_labels.itemconfigure('all', state = 'normal')
 
+        # show either the detailed labels or the others
+        detailed = self.show_detail_time_labels()
+        if detailed: self.time_labels.itemconfigure('label', state = 'hidden')
+
         text_size = self.time_labels.default_text_size
 
         offset = {}
@@ -277,7 +322,7 @@ class Visualisation(object):
 
         height = None
 
-        for label in self.time_labels.find_all():
+        for label in self.time_labels.find_withtag('detail' if detailed else 'label'):
             lower_x, lower_y, upper_x, upper_y = self.time_labels.bbox(label)
 
             line = 0
@@ -430,20 +475,102 @@ class Visualisation(object):
                         self.position_labels.itemconfigure(group.footer, state = 'hidden')
                         break
 
+    def show_location(self, event, correction, interval):
+        x, y = self.normalize_coordinates(event.x, event.y)
+        if self.mirror: y = - y
+        x, y = map(lambda a, b: a - b, (x, y), correction)
+        x = round(x - 0.5)
+        y = round(y - 0.5)
+        if y < interval.lower: y = interval.lower
+        elif y >= interval.upper: y = interval.upper - 1
+
+        self.location_label['text'] = self.location_information(x, y, interval)
+
+    def plot_runs(self, runs, position, interval, offset):
+        """
+        Draw the given (start, end, result) triples of the bit position
+        in the group of the given interval placed at the given offset.
+
+        The rectangles are transformed like the content already on the canvas.
+        """
+
+        origin_x, origin_y = self.content.coords(self.content.origin)[:2]
+        unit_x, unit_y = self.content.coords(self.content.unit_point)[:2]
+        scale_x, scale_y = unit_x - origin_x, unit_y - origin_y
+
+        location = Interval(offset + position - interval.lower, 1, length_given = True)
+        if self.mirror: location = - location[0], - location[1]
+
+        for start, end, value in runs:
+            box = (origin_x + start * scale_x, origin_y + location[0] * scale_y,
+                   origin_x + end   * scale_x, origin_y + location[1] * scale_y)
+
+            point = self.content.create_rectangle(box, width = 0, fill = self.coloring[value], tag = 'value{:x}'.format(value))
+            self.content.tag_bind(point, '<<Inside>>',  lambda event, correction = (0, offset - interval.lower), interval = interval:
+                                  self.show_location(event, correction, interval))
+            self.content.tag_bind(point, '<Leave>',     lambda _: self.location_label.configure(text = ''))
+
+    def add_data(self, data):
+        """
+        Draw the given runs of experiment results
+        whose bit positions lie in one of the plotted groups.
+
+        Return the list of the remaining bit positions.
+        """
+
+        remaining = []
+        intervals = self.group_offsets.keys()
+
+        for position, runs in data.items():
+            index = self.group_offsets.bisect((position, position + 1))
+            interval = intervals[index - 1] if index else None
+            if interval is None or not interval.lower <= position < interval.upper:
+                remaining.append(position)
+                continue
+            self.plot_runs(runs, position, interval, self.group_offsets[interval])
+
+        return remaining
+
+    def replot(self, data, time_labels, position_groups, location_information):
+        """
+        Replace the plotted data and labels keeping the current zoom and view.
+        """
+
+        origin_x, origin_y = self.content.coords(self.content.origin)[:2]
+        unit_x, unit_y = self.content.coords(self.content.unit_point)[:2]
+        view_x, view_y = self.content.xview()[0], self.content.yview()[0]
+
+        for canvas in self.content, self.time_labels, self.position_labels:
+            canvas.delete('all')
+
+        self.content.origin     = self.content.create_rectangle(0, 0, 0, 0, width = 0, state = 'hidden')
+        self.content.unit_point = self.content.create_rectangle(1, 1, 1, 1, width = 0, state = 'hidden')
+
+        self.time_labels.inner_lines = {}
+        self.time_labels.outer_lines = {}
+        self.time_labels.labels = SortedDict()
+        self.position_labels.labels = SortedDict()
+
+        self.plot(data, time_labels, position_groups, location_information)
+
+        self.content        .scale('all', 0, 0, unit_x - origin_x, unit_y - origin_y)
+        self.time_labels    .scale('all', 0, 0, unit_x - origin_x, 1)
+        self.position_labels.scale('all', 0, 0, 1, unit_y - origin_y)
+        self.content        .move('all', origin_x, origin_y)
+        self.time_labels    .move('all', origin_x, 0)
+        self.position_labels.move('all', 0, origin_y)
+
+        self.manage_content()
+        for canvas in self.content, self.time_labels: canvas.xview_moveto(view_x)
+        for canvas in self.content, self.position_labels: canvas.yview_moveto(view_y)
+
     def plot(self, data, time_labels, position_groups, location_information):
         group_number = 0
+        self.location_information = location_information
 
-        def show_location(event, correction, interval):
-            x, y = self.normalize_coordinates(event.x, event.y)
-            if self.mirror: y = - y
-            x, y = map(lambda a, b: a - b, (x, y), correction)
-            x = round(x - 0.5)
-            y = round(y - 0.5)
-            if y < interval.lower: y = interval.lower
-            elif y >= interval.upper: y = interval.upper - 1
+        # the offset of the plotted group of each leaf interval
+        self.group_offsets = SortedDict()
 
-            self.location_label['text'] = location_information(x, y, interval)
-    
         def create_time_label(label_text, distance):
             label = self.time_labels.create_text(distance, 0, text = label_text, tag = 'label', anchor = 'nw')
 
@@ -492,19 +619,10 @@ class Visualisation(object):
         depth = 0
 
         for interval, group in position_groups.items():
-            for position in range(*interval):
-                try:
-                    for time, value in data[position].items():
-                        location = Interval(offset + position - interval.lower, 1, length_given = True)
-                        if self.mirror: box = time[0], - location[0], time[1], - location[1]
-                        else:           box = time[0], + location[0], time[1], + location[1]
-
-                        point = self.content.create_rectangle(box, width = 0, fill = self.coloring[value], tag = 'value{:x}'.format(value))
-                        self.content.tag_bind(point, '<<Inside>>',  lambda event, correction = (0, offset - interval.lower), interval = interval:
-                                              show_location(event, correction, interval))
-                        self.content.tag_bind(point, '<Leave>',     lambda _: self.location_label.configure(text = ''))
-                except KeyError: pass
+            for position, runs in data[interval.lower:interval.upper].items():
+                self.plot_runs(runs, position, interval, offset)
 
+            self.group_offsets[interval] = offset
             groups_list.append(GroupData(group, Interval(offset, interval.length, True), True))
             depth = max(group.depth, depth)
 
@@ -27,9 +27,9 @@ class Grouping(namedtuple('Grouping', ['header', 'footer', 'parent'])):
         else:                   self.depth = self.parent.depth + 1 
 
 class Choice(Grouping):
-    def initialise(self, subgroups = []):
+    def initialise(self, subgroups = ()):
         super().initialise()
-        self.subgroupings = subgroupings
+        self.subgroups = list(subgroups)
         self.choice = 0
 
     def add_subgroup(self, subgroup):
@@ -37,4 +37,4 @@ class Choice(Grouping):
 
     def choose(self, index):
         self.choice = index
-        return self.subgroupings[index]
+        return self.subgroups[index]
@@ -3,18 +3,37 @@
 import re
 import csv
 import math
+from operator import itemgetter
+from functools import lru_cache
+from collections import ChainMap
+from itertools import repeat
+from io import StringIO
+from glob import glob
+from hashlib import blake2b
+from os import path
 from sys import stdout
+from time import monotonic
 from bisect import bisect
 from decimal import Decimal
 from subprocess import check_output
-from argparse import ArgumentParser
-from tkinter import Tk
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor
 
-from sortedcontainers import SortedDict
+import numpy
+from sortedcontainers import SortedDict, SortedList
 
-from graphical_interface import Visualisation
-from structures import parse_structures_recursive, Structure, Substructure, Data, DataUnion
+from structures import parse_structures_recursive, save_structures, load_structures, version as structures_version, \
+                       infer_sizes, Structure, Substructure, Data, DataUnion, Array
 from grouping import Interval, Grouping, Choice
+from campaign import Campaign, parse_integers, first_record_end, record_boundary, record_blocks, record_offsets, \
+                     concatenate_columns, merge_campaigns, Runs, IntervalIndex
+from classification import Classifier, read_classification_rules
+from result_statistics import weighted_statistics, interval_groups, merge_groups, merge_sizes, write_csv, write_json
+from elf import ElfFile, Symbol, read_elf_symbols, read_elf_data_symbols, read_build_id, demangle
+from symbols import SymbolTable
+from dwarf import LineTable, DebugInfo, DebugStructures
+from database import create_database, read_database_kind, load_database
+from cache import lookup, store, cached, cache_key, known_digest, remember_digest, file_stamp, file_digest
 
 class Result(object):
     """
@@ -39,92 +58,99 @@ class Result(object):
     USER_ERROR, \
     OTHER_ERROR = range(7)
 
-    def __init__(self, names):
-        self.parsers = []
+    count = 7
 
-        for name in names:
+    @staticmethod
+    def show(result):
+        if result == Result.OK:                       return 'OK'
+        if result == Result.WRONG:                    return 'WRONG'
+        if result == Result.ASSERT_FAILED:            return 'ASSERT_FAILED'
+        if result == Result.DOUBLE_FAULT:             return 'DOUBLE_FAULT'
+        if result == Result.GENERAL_PROTECTION_FAULT: return 'GENERAL_PROTECTION_FAULT'
+        if result == Result.USER_ERROR:               return 'USER_ERROR'
+        if result == Result.OTHER_ERROR:              return 'OTHER_ERROR'
+        raise ValueError('Result.show: not a result constant')
+
+    def __init__(self, names, classifier):
+        # column index and number base of each known field
+        self.columns = {}
+        self.width = len(names)
+        self.classifier = classifier
+
+        for index, name in enumerate(names):
             if re.search('HEX', name): base = 16
             else: base = 10
 
-            if re.search('bit_offset', name):
-                def parse_bit(result, name = name, base = base):
-                    self.bit = int(result[name], base)
-                self.parsers.append(parse_bit)
-            elif re.search('register_offset', name):
-                def parse_register(result, name = name):
-                    self.register = Register.read(result[name])
-                self.parsers.append(parse_register)
-            elif re.search('injection_address', name):
-                def parse_address(result, name = name, base = base):
-                    self.address = Memory.read(result[name], base)
-                self.parsers.append(parse_address)
-            elif re.search('injection_ip', name):
-                def parse_instruction_pointer(result, name = name, base = base):
-                    self.instruction_pointer = Memory.read(result[name], base)
-                self.parsers.append(parse_instruction_pointer)
-            elif re.search('time1', name):
-                def parse_start_time(result, name = name, base = base):
-                    self.start_time = int(result[name], base)
-                self.parsers.append(parse_start_time)
-            elif re.search('time2', name):
-                def parse_end_time(result, name = name, base = base):
-                    self.end_time = int(result[name], base)
-                self.parsers.append(parse_end_time)
-            elif re.search('resulttype', name):
-                def parse_result_type(result, name = name):
-                    self.result_type = result[name]
-                self.parsers.append(parse_result_type)
-            elif re.search('output', name):
-                def parse_output(result, name = name):
-                    self.output = result[name]
-                self.parsers.append(parse_output)
-
-    def classify(self):
+            if   re.search('bit_offset',        name): self.columns['bit']                 = index, base
+            elif re.search('register_offset',   name): self.columns['register']            = index, base
+            elif re.search('injection_address', name): self.columns['address']             = index, base
+            elif re.search('injection_ip',      name): self.columns['instruction_pointer'] = index, base
+            elif re.search('time1',             name): self.columns['start_time']          = index, base
+            elif re.search('time2',             name): self.columns['end_time']            = index, base
+            elif re.search('resulttype',        name): self.columns['result_type']         = index, base
+            elif re.search('output',            name): self.columns['output']              = index, base
+
+    def column(self, rows, field):
         """
-        Get result constant corresponding to the experiment result.
+        Return the list of raw values of the given field in the given rows.
+
+        Return None if the field is not present.
         """
 
-        if self.result_type == "DONE":
-            return Result.OK
-
-        elif re.search("DOUBLE FAULT", self.output):
-            return Result.DOUBLE_FAULT
-        elif re.search("General Protection", self.output):
-            return Result.GENERAL_PROTECTION_FAULT
-        elif re.search("L4Re.*page fault", self.output):
-            return Result.USER_ERROR
-        elif re.search("L4Re.*unhandled exception", self.output):
-            return Result.USER_ERROR
-        elif re.search("MOE.*rm", self.output):
-            return Result.USER_ERROR
-        elif re.search("Return reboots", self.output):
-            return Result.DOUBLE_FAULT
-        elif re.search("ASSERTION", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("src\/kern\/context.cpp:1283", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("src\/kern\/ia32\/thread-ia32.cpp:65", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("src\/kern\/ia32\/thread-ia32.cpp:136", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("src\/kern\/ia32\/mem_space-ia32.cpp:185", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("src/kern/mapdb.cpp:609", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("N_FAILED", self.output):
-            return Result.ASSERT_FAILED
-        elif re.search("Error: Item", self.output):
-            return Result.WRONG
-
-        elif self.result_type == "WRONG":
-            return Result.WRONG
-        else:
-            return Result.OTHER_ERROR
+        try: index = self.columns[field][0]
+        except KeyError: return None
+        return list(map(itemgetter(index), rows))
 
-    def parse(self, result):
-        for parser in self.parsers:
-            try: parser(result)
-            except ValueError: continue
+    def integers(self, rows, field):
+        """
+        Return an integer array and a validity mask for the given field.
+        """
+
+        strings = self.column(rows, field)
+        if strings is None:
+            return numpy.zeros(len(rows), numpy.int64), numpy.zeros(len(rows), bool)
+        return parse_integers(strings, self.columns[field][1])
+
+    def classify(self, rows):
+        """
+        Return an array of the result constants of the given rows.
+        """
+
+        result_types = self.column(rows, 'result_type')
+        if result_types is None: result_types = [None] * len(rows)
+        outputs = self.column(rows, 'output')
+        if outputs is None: outputs = [''] * len(rows)
+
+        return self.classifier.classify(result_types, outputs)
+
+    def decode(self, rows, data_class):
+        """
+        Decode the given csv rows into a dictionary of arrays.
+
+        The dictionary contains the arrays:
+          positions, starts, ends, results - of all complete experiments
+          trace_times, trace_pointers      - of all complete trace entries
+        Rows with missing or invalid fields are left out.
+        """
+
+        # ignore incomplete rows
+        rows = [row for row in rows if len(row) >= self.width]
+
+        positions, valid_positions = data_class.bit_positions(self, rows)
+        start_times, valid_start_times = self.integers(rows, 'start_time')
+        end_times, valid_end_times = self.integers(rows, 'end_time')
+        instruction_pointers, valid_instruction_pointers = Memory.addresses(self, rows, 'instruction_pointer')
+
+        experiments = valid_positions & valid_start_times & valid_end_times
+        trace = valid_end_times & valid_instruction_pointers
+
+        return { 'positions'      : positions[experiments]
+               , 'starts'         : start_times[experiments] - 1
+               , 'ends'           : end_times[experiments]
+               , 'results'        : self.classify(rows)[experiments]
+               , 'trace_times'    : end_times[trace] - 1
+               , 'trace_pointers' : instruction_pointers[trace]
+               }
 
 class Register(object):
     bits = 32
@@ -157,9 +183,28 @@ class Register(object):
         raise ValueError('Register.show: not a register number')
 
     @staticmethod
-    def bit_position(result):
-        if result.bit is not None and result.register is not None:
-            return result.register * Register.bits + result.bit
+    def bit_positions(result, rows):
+        """
+        Return an array of the bit positions of the given rows and its validity mask.
+        """
+
+        bits, valid_bits = result.integers(rows, 'bit')
+        names = result.column(rows, 'register')
+        if names is None: return bits, numpy.zeros(len(rows), bool)
+
+        registers = numpy.zeros(len(rows), numpy.int64)
+        valid_registers = numpy.zeros(len(rows), bool)
+
+        # read each distinct register name only once
+        unique_names, inverse = numpy.unique(numpy.array(names, object), return_inverse = True)
+        for index, name in enumerate(unique_names.tolist()):
+            try: register = Register.read(name)
+            except ValueError: continue
+            selection = inverse == index
+            registers[selection] = register
+            valid_registers[selection] = True
+
+        return registers * Register.bits + bits, valid_bits & valid_registers
 
 class Memory(object):
     bits = 8
@@ -179,21 +224,122 @@ class Memory(object):
         return "0x{:X}".format(address)
 
     @staticmethod
-    def bit_position(result):
-        if result.bit is not None and result.address is not None:
-            return result.address * Memory.bits + result.bit
+    def addresses(result, rows, field):
+        """
+        Return an array of the memory addresses in the given field and its validity mask.
+        """
+
+        addresses, valid = result.integers(rows, field)
+        addresses[addresses < 0] += 0x100000000
+        return addresses, valid
+
+    @staticmethod
+    def bit_positions(result, rows):
+        """
+        Return an array of the bit positions of the given rows and its validity mask.
+        """
+
+        bits, valid_bits = result.integers(rows, 'bit')
+        addresses, valid_addresses = Memory.addresses(result, rows, 'address')
+        return addresses * Memory.bits + bits, valid_bits & valid_addresses
 
-def create_symbol_table(filename):
+def create_symbol_table(filename, rebuild_cache = False):
     """
-    Return a dictionary of address to symbol mappings for the given file.
+    Return the table of the symbols of the given file.
 
-    Extract the symbols using the tool 'nm'.
+    Read the symbols from the symbol table of the ELF file directly,
+    their names are demangled only when they are used.
+    Extract the symbols using the tool 'nm' if the file is no ELF file.
     Ignore the type of the symbol.
 
+    The table is cached under the build id of the file or its content hash,
+    so it is shared by all campaigns testing the same build.
+
     The filename should correspond to an C++ object file.
     """
 
-    symbol_table = SortedDict()
+    return cached('symbols', cache_key(SymbolTable.version, binary_identity(filename)),
+                  lambda: extract_symbol_table(filename), SymbolTable.save, SymbolTable.load, rebuild_cache)
+
+def binary_identity(filename):
+    """
+    Return a string identifying the build of the given binary,
+    its build id or else its content hash.
+    """
+
+    identity = read_build_id(filename)
+    if identity is None: return 'content ' + file_digest(filename)
+    return 'build id ' + identity
+
+def map_binaries(function, filenames, rebuild_cache = False, jobs = 1):
+    """
+    Return the list of the results of the given function for each binary,
+    computed in parallel with more than one job.
+    """
+
+    if jobs > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(min(jobs, len(filenames))) as executor:
+            return list(executor.map(function, filenames, repeat(rebuild_cache)))
+    return [function(filename, rebuild_cache) for filename in filenames]
+
+def create_symbol_tables(binaries, rebuild_cache = False, jobs = 1):
+    """
+    Return the table of the symbols of all given binaries.
+
+    Arguments:
+      binaries - list of filename-base address-pairs of the binaries
+
+    The symbol tables of several binaries are created in parallel
+    and merged at their base addresses.
+    """
+
+    filenames, bases = zip(*binaries)
+    if len(binaries) == 1 and not bases[0]: return create_symbol_table(filenames[0], rebuild_cache)
+
+    return SymbolTable.merge(map_binaries(create_symbol_table, filenames, rebuild_cache, jobs), bases)
+
+def create_line_table(filename, rebuild_cache = False):
+    """
+    Return the index from addresses to source lines
+    built from the DWARF line table of the given ELF file.
+
+    The index is cached under the build id of the file or its content hash.
+    """
+
+    def build():
+        with ElfFile(filename) as elf_file: return LineTable.from_elf(elf_file)
+
+    return cached('lines', cache_key(LineTable.version, binary_identity(filename)),
+                  build, LineTable.save, LineTable.load, rebuild_cache)
+
+def create_line_tables(binaries, rebuild_cache = False, jobs = 1):
+    """
+    Return the index from addresses to source lines of all given binaries.
+
+    Arguments:
+      binaries - list of filename-base address-pairs of the binaries
+    """
+
+    filenames, bases = zip(*binaries)
+    if len(binaries) == 1 and not bases[0]: return create_line_table(filenames[0], rebuild_cache)
+    return LineTable.merge(map_binaries(create_line_table, filenames, rebuild_cache, jobs), bases)
+
+def extract_symbol_table(filename):
+    try: symbols = read_elf_symbols(filename)
+    except ValueError: return SymbolTable.from_symbols(extract_symbols_with_nm(filename))
+
+    # of several symbols at the same address use the last one by name, just like 'nm'
+    return SymbolTable.from_symbols(sorted(symbols, key = lambda pair: pair[1].name))
+
+def extract_symbols_with_nm(filename):
+    """
+    Return a list of address-symbol-pairs for the given file.
+
+    Extract the symbols using the tool 'nm'.
+    Ignore the type of the symbol.
+    """
+
+    symbols = []
 
     # use '-C' to demangle C++ names
     for line in check_output(['nm', '-C', filename], universal_newlines = True).strip().split('\n'):
@@ -204,24 +350,24 @@ def create_symbol_table(filename):
             name    = values[2]
         except (IndexError, ValueError): continue
 
-        symbol_table[address] = name
+        symbols.append((address, Symbol(name, None)))
 
-    return symbol_table
+    return symbols
 
-def read_symbol_table(filename):
+def read_symbol_table(filename, rebuild_cache = False):
     """
-    Read the dictionary of address to symbol mappings from the given file.
+    Read the table of symbols from the given file.
 
     Ignore the type of the symbol.
+    The table is cached under the content hash of the file.
 
     The filename should correspond to a file
     containing the output of the 'nm' tool for an C++ object file.
     """
 
-    symbol_table = SortedDict()
-
-    try:
-        with open(filename, 'rb') as symbol_file:
+    def read():
+        symbols = []
+        with open(filename, newline = '') as symbol_file:
             for values in csv.reader(symbol_file, delimiter = ' '):
                 # values : [ 'address', 'symbol type', 'symbol name' ]
                 try:
@@ -229,70 +375,238 @@ def read_symbol_table(filename):
                     name    = ' '.join(values[2:])
                 except (IndexError, ValueError): continue
 
-                symbol_table[address] = name
-    except IOError: pass
+                symbols.append((address, Symbol(name, None)))
+        return SymbolTable.from_symbols(symbols)
+
+    try: identity = 'symbol dump ' + file_digest(filename)
+    except IOError: return SymbolTable.from_symbols([])
 
-    return symbol_table
+    return cached('symbols', cache_key(SymbolTable.version, identity), read, SymbolTable.save, SymbolTable.load, rebuild_cache)
 
-def create_time_labels(trace, symbol_table):
+def create_time_labels(times, instruction_pointers, symbol_table):
     """
     Return a list of time-label-pairs.
 
     Arguments:
-      trace - list of time-instruction pointer-pairs
-      symbol_table - dictionary of address-symbol-mappings
+      times - array of the times of the trace in ascending order
+      instruction_pointers - array of the instruction pointers of the trace
+      symbol_table - table of the symbols sorted by address
 
-    Process the trace in the order of the times.
     Foreach instruction pointer in the trace:
       Lookup the symbol with the biggest address 
       less than or equal to the instruction pointer.
       If the symbol is not the same as for the previous instruction pointer:
         Append the time and symbol to the final list.
+
+    The whole trace is looked up in one sorted search.
+    Only the names of the symbols hit by the trace are demangled
+    and split into function names, each one once.
     """
 
-    # final list of time-label-pairs
-    labels = []
+    if not len(symbol_table) or not len(times): return []
 
-    # sorted list of all addresses in the symbol table
-    symbol_addresses = list(symbol_table)
+    # sorted array of all addresses in the symbol table,
+    # unsigned to hold the addresses of 64 bit code
+    symbol_addresses = symbol_table.addresses
 
-    last_symbol = None
-    for time, instruction_pointer in trace.items():
-        try:
-            # the biggest address smaller or equal to the instruction pointer
-            address = symbol_addresses[bisect(symbol_addresses, instruction_pointer) - 1]
-            # lookup the corresponding symbol and extract the function name
-            symbol = symbol_table[address].split('(')[0]
+    # the index of the biggest address smaller or equal to each instruction pointer
+    indices = numpy.searchsorted(symbol_addresses, numpy.asarray(instruction_pointers).astype(numpy.uint64), 'right') - 1
+    # an instruction pointer below all symbols wraps around to the last symbol like a list index
+    indices[indices < 0] = len(symbol_addresses) - 1
 
-            # only add a label if the symbol changed
-            if symbol != last_symbol:
-                labels.append((time, symbol))
-                last_symbol = symbol
-        except IndexError: pass # ignore instruction pointer with no corresponding symbol
+    # the function names of the symbols hit, numbered such that equal names get equal numbers
+    hit_indices, hits = numpy.unique(indices, return_inverse = True)
+    names = [symbol_table.name(index) for index in hit_indices.tolist()]
+    demangle.demangle_all(names)
+    function_names, numbers = numpy.unique(numpy.array([demangle(name).split('(')[0] for name in names], object),
+                                           return_inverse = True)
+    functions = numbers[hits.reshape(-1)]
 
-    return labels
+    # only add a label if the function changed
+    changes = numpy.flatnonzero(numpy.append(True, functions[1:] != functions[:-1]))
+    return list(zip(numpy.asarray(times)[changes].tolist(), function_names[functions[changes]].tolist()))
 
-def parse_results(filename, data_class):
-    data = SortedDict()
-    trace = SortedDict()
-    line_number = 0
+def extend_time_labels(labels, times, instruction_pointers, since, create_labels, table):
+    """
+    Return the time labels of the given trace
+    extending the given labels of the trace before the given time.
 
-    with open(filename, encoding = 'utf8', errors = 'ignore') as result_file:
-        reader = csv.DictReader(result_file)
-        result = Result(reader.fieldnames)
-        for line in reader:
-            result.parse(line)
-            bit_position = data_class.bit_position(result)
+    Only the labels from the last one before that time on are created again
+    by the given function with the given table, e.g. create_time_labels with a symbol table.
+    """
 
-            try: trace[result.end_time - 1] = result.instruction_pointer
-            except AttributeError: pass
+    last = bisect(labels, (since,)) - 1
+    if last < 0: return create_labels(times, instruction_pointers, table)
+    start = numpy.searchsorted(times, labels[last][0])
+    return labels[:last] + create_labels(times[start:], instruction_pointers[start:], table)
 
-            try:
-                data.setdefault(bit_position, SortedDict())
-                data[bit_position][result.start_time - 1, result.end_time] = result.classify()
-            except AttributeError: pass
+def create_line_labels(times, instruction_pointers, line_table):
+    """
+    Return a list of time-label-pairs
+    labelling the times where the source line of the trace changes.
+
+    Times with no known source line get an empty label.
+    """
+
+    if not len(line_table) or not len(times): return []
+
+    rows = line_table.rows(instruction_pointers)
+    known = rows >= 0
+    files = numpy.where(known, numpy.asarray(line_table.files)[rows], -1)
+    lines = numpy.where(known, numpy.asarray(line_table.lines)[rows], 0)
+
+    changes = numpy.flatnonzero(numpy.append(True, (files[1:] != files[:-1]) | (lines[1:] != lines[:-1])))
+    return [(time, line_table.location(row) if row >= 0 else '')
+            for time, row in zip(numpy.asarray(times)[changes].tolist(), rows[changes].tolist())]
+
+def parse_shard(filename, start, end, header, data_class, classifier, block_size):
+    """
+    Return the columns, the number of rows and the classification state
+    of the records between the given offsets of the csv file.
+
+    Meant to be run in a worker process of parse_results.
+    """
+
+    # collect only the hits and memo entries of this range in the copy of the classifier
+    classifier.reset()
+
+    result = Result(header, classifier)
+    parts = []
+    row_count = 0
+
+    with open(filename, 'rb') as result_file:
+        result_file.seek(start)
+        for block in record_blocks(result_file, block_size, end):
+            rows = list(csv.reader(StringIO(block.decode('utf8', 'ignore'), newline = '')))
+            parts.append(result.decode(rows, data_class))
+            row_count += len(rows)
+            del rows
+
+    return concatenate_columns(parts), row_count, (classifier.hits, classifier.learned, classifier.outputs)
+
+def parse_results(filename, data_class, classifier, block_size = 1 << 26, progress = None, jobs = 1, content_hash = None):
+    """
+    Return the campaign described by the given csv file of test results.
+
+    The file is read in blocks of about the given size
+    consisting of complete records.
+    Each block is decoded column-wise into compact arrays,
+    so besides these arrays only the rows of one block are held in memory.
+    The experiment outputs are classified with the given classifier.
+
+    With more than one job the file is split into ranges of complete records
+    which are parsed by a pool of worker processes.
+    Their columns are combined in file order,
+    so the campaign is the same as the one parsed by a single process.
+
+    The optional progress function is called after each block or range with
+    the number of bytes read, the size of the file and the number of rows.
+    The content of the file is fed into the optional content hash on the way.
+    """
+
+    size = path.getsize(filename)
+    parts = []
+    row_count = 0
+
+    with open(filename, 'rb') as result_file:
+        if jobs > 1:
+            # several ranges per job balance uneven ranges and show progress
+            offsets = record_offsets(result_file, 4 * jobs, content_hash = content_hash)
+            result_file.seek(0)
+            header = next(csv.reader(StringIO(result_file.read(offsets[0]).decode('utf8', 'ignore'), newline = '')), [])
+
+            with ProcessPoolExecutor(jobs) as executor:
+                shards = executor.map(parse_shard, repeat(filename), offsets[:-1], offsets[1:], repeat(header),
+                                      repeat(data_class), repeat(classifier), repeat(block_size))
+                for end, (columns, shard_row_count, classification) in zip(offsets[1:], shards):
+                    parts.append(columns)
+                    row_count += shard_row_count
+                    classifier.update(*classification)
+                    if progress is not None: progress(end, size, row_count)
+
+            return Campaign(**concatenate_columns(parts))
+
+        result = None
+        for block in record_blocks(result_file, block_size):
+            if content_hash is not None: content_hash.update(block)
+            rows = list(csv.reader(StringIO(block.decode('utf8', 'ignore'), newline = '')))
+
+            if result is None:
+                if not rows: continue
+                result = Result(rows[0], classifier)
+                rows = rows[1:]
+
+            parts.append(result.decode(rows, data_class))
+            row_count += len(rows)
+            del rows
+
+            if progress is not None: progress(result_file.tell(), size, row_count)
+
+    return Campaign(**concatenate_columns(parts))
+
+def load_results(filename, data_class, classifier, rebuild_cache = False, **keyword_arguments):
+    """
+    Return the campaign described by the given csv file of test results.
+
+    Reuse the cached campaign if the file, the data class
+    and the classification rules did not change since it was parsed.
+    Otherwise pass the keyword arguments on to parse_results
+    and hash the file while parsing it, so it is read only once.
+    """
+
+    def key(digest):
+        return cache_key(Campaign.version, digest, data_class.__name__, classifier.rules)
+
+    digest = known_digest(filename)
+    if digest is not None and not rebuild_cache:
+        campaign = lookup('campaigns', key(digest), Campaign.load)
+        if campaign is not None: return campaign
+
+    stamp = file_stamp(filename)
+    content_hash = blake2b()
+    campaign = parse_results(filename, data_class, classifier, content_hash = content_hash, **keyword_arguments)
+
+    digest = content_hash.hexdigest()
+    remember_digest(filename, digest, stamp)
+    store('campaigns', key(digest), campaign, Campaign.save)
+    return campaign
+
+def result_files(names):
+    """
+    Return the list of csv files given directly or contained in the given directories.
+    """
+
+    filenames = []
+    for name in names:
+        if path.isdir(name): filenames.extend(sorted(glob(path.join(name, '*.csv'))))
+        else: filenames.append(name)
+    return filenames
+
+def load_campaign(names, data_class, classifier, description, **keyword_arguments):
+    """
+    Return the campaign combining the test results of all given csv files and directories.
+
+    Each file is loaded once and the campaigns are merged by bit position and time.
+    Experiments found in several files are reported.
+    """
+
+    filenames = result_files(names)
+    campaigns = []
+    for number, filename in enumerate(filenames, 1):
+        if len(filenames) > 1:
+            file_description = '{} [{:d}/{:d}] {}'.format(description, number, len(filenames), filename)
+        else: file_description = description
+        campaigns.append(print_status(file_description,
+                                      load_results, filename, data_class, classifier,
+                                      progress = Progress(file_description), **keyword_arguments))
+
+    if len(campaigns) == 1: return campaigns[0]
 
-    return data, trace
+    campaign, report = print_status('merge test results', merge_campaigns, campaigns)
+    if report.duplicates: print('warning: {:d} experiments appear in several files'.format(report.duplicates))
+    if report.conflicts:  print('warning: {:d} experiments have conflicting results in different files'.format(report.conflicts))
+    if report.overlaps:   print('warning: {:d} experiments overlap experiments of other files'.format(report.overlaps))
+    return campaign
 
 def create_register_labels():
     labels = SortedDict()
@@ -318,19 +632,77 @@ def parse_memory_usage_data(file_name):
     except (IOError, TypeError): pass
     return sorted(memory_usage)
 
-def parse_structures(file_name):
-    try:
-        with open(file_name) as structures_file:
-            content = structures_file.read()
-    except (IOError, TypeError): content = ''
-    return parse_structures_recursive(content)
+def read_memory_usage(binaries, structures = None):
+    """
+    Return the memory usage given by the variables in the symbol tables of the given binaries,
+    the sorted list of the pairs of the bit interval and the name of each variable.
+
+    Arguments:
+      binaries - list of filename-base address-pairs of the binaries
+      structures - dictionary from names to data structures,
+                   the names of the symbols are only kept mangled if just they are in it
+
+    Of variables overlapping each other only the first and biggest one is kept,
+    so the intervals do not overlap.
+    """
+
+    symbols = []
+    for filename, base in binaries:
+        try: symbols.extend((base + address, symbol) for address, symbol in read_elf_data_symbols(filename))
+        except (IOError, ValueError): pass
+    symbols.sort(key = lambda pair: (pair[0], -pair[1].size, pair[1].name))
+
+    if structures is None: structures = {}
+    demangle.demangle_all(symbol.name for _, symbol in symbols)
+
+    memory_usage = []
+    end = 0
+    for address, symbol in symbols:
+        if address < end: continue
+        end = address + symbol.size
+        name = demangle(symbol.name)
+        if name not in structures and symbol.name in structures: name = symbol.name
+        memory_usage.append((Interval(address * Memory.bits, symbol.size * Memory.bits, True), name))
+    return memory_usage
+
+def parse_structures(file_name, rebuild_cache = False):
+    """
+    Return the dictionary from names to data structures described in the given structures file.
+
+    The parsed structures are cached under the content hash of the file,
+    so they are shared by all campaigns testing the same build.
+    """
+
+    def parse():
+        try:
+            with open(file_name) as structures_file:
+                content = structures_file.read()
+        except (IOError, TypeError): content = ''
+
+        try: return parse_structures_recursive(content)
+        except ValueError as error: raise SystemExit('{}: {}'.format(file_name, error))
 
-def generate_clusters(positions):
-    if not positions: raise StopIteration
+    try: digest = file_digest(file_name)
+    except (IOError, TypeError): return parse()
+    return cached('structures', cache_key(structures_version, digest), parse, save_structures, load_structures, rebuild_cache)
 
-    maximal_distance = 8
-    
-    lower = next(positions)
+def read_debug_structures(binaries):
+    """
+    Return the data structures of the variables of all given binaries
+    built from their DWARF debugging information on the first lookup of each variable.
+
+    Arguments:
+      binaries - list of filename-base address-pairs of the binaries
+    """
+
+    structures = []
+    for filename, _ in binaries:
+        with ElfFile(filename) as elf_file: structures.append(DebugStructures(DebugInfo(elf_file)))
+    return ChainMap(*structures)
+
+def generate_clusters(positions, maximal_distance = 8):
+    lower = next(positions, None)
+    if lower is None: return
     upper = lower + 1
     for position in positions:
         if position - upper >= maximal_distance:
@@ -371,7 +743,6 @@ def create_memory_labels(clusters, memory_usage = None, structures = None, mirro
             if isinstance(structure, DataUnion):
                 parent = Choice(*parent)
                 nonlocal clusters, groups
-                original_cluster = cluster
                 supergroups = groups
                 cluster_list = []
 
@@ -389,17 +760,30 @@ def create_memory_labels(clusters, memory_usage = None, structures = None, mirro
                 supergroups.update(groups)
                 remaining_clusters = clusters
 
-                for substructure in structure.substructures.items():
+                # each member is labelled on its own span, the clusters of the union beyond it are left out
+                for substructure in structure.substructures:
+                    if not substructure.possible_size_known:
+                        substructure.add_possible_size(position.length // Memory.bits)
+                    member_position = Interval(position.lower, position.lower + substructure.size * Memory.bits)
                     clusters = iter(cluster_list)
                     groups = SortedDict()
-                    create_structure_labels(substructure, position, original_cluster, parent)
+                    create_structure_labels(substructure, member_position, next(clusters, None), parent)
                     parent.add_subgroup(groups)
 
+                clusters = remaining_clusters
                 groups = supergroups
                 return cluster
 
             parent_position = position
-            for offset, substructure in structure.substructures.items():
+            substructures = structure.substructures
+            index = 0
+            # the labels of a substructure may use up all remaining clusters
+            while cluster is not None and index < len(substructures):
+                # skip the substructures before the cluster, so only the touched cells of arrays are created
+                index = max(index, substructures.bisect((cluster.lower - parent_position.lower) // Memory.bits) - 1)
+                offset, substructure = substructures.peekitem(index)
+                index += 1
+
                 assert offset == substructure.offset
                 lower = parent_position.lower + substructure.offset * Memory.bits
                 if not substructure.possible_size_known:
@@ -425,6 +809,23 @@ def create_memory_labels(clusters, memory_usage = None, structures = None, mirro
             cluster = Interval(position.upper, cluster.upper)
         return cluster
 
+    # the memory usage data knows the sizes of the variables,
+    # the sizes of all touched ones are narrowed before one inference over all of them
+    clusters = list(clusters)
+    uppers = [cluster.upper for cluster in clusters]
+    touched = []
+    for position, name in memory_usage:
+        index = bisect(uppers, position.lower)
+        if index == len(clusters) or clusters[index].lower >= position.upper or name not in structures: continue
+        structure = structures[name]
+        if not structure.size_known:
+            size = int(math.ceil(position.length / Memory.bits))
+            structure.remove_possible_sizes_below(size)
+            structure.remove_possible_sizes_above(size)
+            touched.append(structure)
+    infer_sizes(touched)
+
+    clusters = iter(clusters)
     cluster = next(clusters, None)
     for position, name in memory_usage:
         while cluster is not None and cluster.upper <= position.lower:
@@ -449,10 +850,258 @@ def create_memory_labels(clusters, memory_usage = None, structures = None, mirro
 
     return groups
 
-def position_information(time_labels, position_labels, register, x, y, interval):
+def relabel_memory(campaign, positions, clusters, position_labels, memory_usage, structures, maximal_distance = 8):
+    """
+    Update the clusters and memory labels after experiments on the given new bit positions were added.
+
+    Arguments:
+      campaign - campaign already containing the new experiments
+      positions - sorted new bit positions
+      clusters - SortedList of the current clusters, updated in place
+      position_labels - dictionary of the current memory labels, updated in place
+
+    Only the clusters close to the new positions are regenerated
+    together with the labels of all data structures they touch.
+    """
+
+    usage_positions = [position for position, _ in memory_usage]
+
+    def extend(lower, upper):
+        # grow the range until no close cluster or touched data structure sticks out of it
+        while True:
+            new_lower, new_upper = lower, upper
+
+            index = max(clusters.bisect_left(Interval(lower - maximal_distance, lower - maximal_distance)) - 1, 0)
+            for cluster in clusters.islice(index):
+                if cluster.lower >= upper + maximal_distance: break
+                if cluster.upper > lower - maximal_distance:
+                    new_lower = min(new_lower, cluster.lower)
+                    new_upper = max(new_upper, cluster.upper)
+
+            index = max(bisect(usage_positions, Interval(lower, lower)) - 1, 0)
+            for position in usage_positions[index:]:
+                if position.lower >= upper: break
+                if position.upper > lower:
+                    new_lower = min(new_lower, position.lower)
+                    new_upper = max(new_upper, position.upper)
+
+            if (new_lower, new_upper) == (lower, upper): return lower, upper
+            lower, upper = new_lower, new_upper
+
+    ranges = []
+    for cluster in generate_clusters(iter(positions), maximal_distance):
+        lower, upper = extend(*cluster)
+        while ranges and ranges[-1][1] + maximal_distance > lower:
+            lower, upper = extend(min(lower, ranges[-1][0]), max(upper, ranges.pop()[1]))
+        ranges.append((lower, upper))
+
+    for lower, upper in ranges:
+        for cluster in list(clusters.irange(Interval(lower, lower), Interval(upper, upper), (True, False))):
+            clusters.remove(cluster)
+        for interval in list(position_labels.irange(Interval(lower, lower), Interval(upper, upper), (True, False))):
+            del position_labels[interval]
+
+        bits = campaign.bits[numpy.searchsorted(campaign.bits, lower):numpy.searchsorted(campaign.bits, upper)]
+        new_clusters = list(generate_clusters(iter(bits.tolist()), maximal_distance))
+        clusters.update(new_clusters)
+
+        usage = [(position, name) for position, name in memory_usage
+                 if lower <= position.lower and position.upper <= upper]
+        position_labels.update(create_memory_labels(iter(new_clusters), usage, structures))
+
+class ResultFollower(object):
+    """
+    Incremental reader of a csv file of test results which is still being written.
+
+    The records already in the file are loaded first,
+    then each poll decodes only the complete records appended since the last one.
+    """
+
+    def __init__(self, filename, data_class, classifier, block_size = 1 << 24):
+        self.filename = filename
+        self.data_class = data_class
+        self.block_size = block_size
+
+        with open(filename, 'rb') as result_file:
+            header_end = first_record_end(result_file)
+            result_file.seek(0)
+            header = next(csv.reader(StringIO(result_file.read(header_end).decode('utf8', 'ignore'), newline = '')), [])
+        self.offset = header_end
+
+        self.result = Result(header, classifier)
+
+    def load(self, size):
+        """
+        Return the campaign of the complete records at least within the first size bytes of the file.
+
+        The file is read only once,
+        the following polls continue after the last record loaded.
+        """
+
+        parts = []
+        while self.offset < size:
+            columns = self.poll()
+            if columns is None: break
+            parts.append(columns)
+        return Campaign(**concatenate_columns(parts))
+
+    def poll(self):
+        """
+        Return the columns of the records appended since the last poll
+        or None if there are no new complete records.
+        """
+
+        with open(self.filename, 'rb') as result_file:
+            result_file.seek(self.offset)
+            data = result_file.read(self.block_size)
+
+        boundary = record_boundary(data)
+        if not boundary:
+            # a single record longer than a block
+            if len(data) == self.block_size: self.block_size *= 2
+            return None
+        self.offset += boundary
+
+        rows = list(csv.reader(StringIO(data[:boundary].decode('utf8', 'ignore'), newline = '')))
+        return self.result.decode(rows, self.data_class)
+
+class LiveView(object):
+    """
+    Keep a visualisation up to date with a csv file of test results which is still being written.
+
+    New experiments on bit positions in the plotted groups are drawn right away.
+    They are inserted into the campaign and its index at most once per merge interval,
+    which only searches the experiments on their bit positions,
+    and the time labels are extended from the earliest new trace time on.
+    Experiments on other positions are collected and the clusters and labels
+    around them are regenerated at most once per relayout interval,
+    which requires plotting the whole campaign again.
+    """
+
+    def __init__(self, root, visualisation, campaign, follower, update_labels,
+                 create_time_labels, location_information, interval = 1000, merge_interval = 5.0,
+                 relayout_interval = 30.0):
+        self.root = root
+        self.visualisation = visualisation
+        self.campaign = campaign
+        self.follower = follower
+        self.update_labels = update_labels
+        self.create_time_labels = create_time_labels
+        self.location_information = location_information
+        self.interval = interval
+        self.merge_interval = merge_interval
+        self.relayout_interval = relayout_interval
+
+        self.pending = []
+        self.pending_positions = []
+        self.last_merge = self.last_relayout = monotonic()
+
+        self.root.after(self.interval, self.poll)
+
+    def poll(self):
+        columns = self.follower.poll()
+        if columns is not None:
+            new_campaign = Campaign(**columns)
+            self.pending.append(new_campaign)
+            self.pending_positions.extend(self.visualisation.add_data(Runs.from_campaign(new_campaign)))
+
+        now = monotonic()
+        if self.pending_positions and now - self.last_relayout >= self.relayout_interval: self.relayout()
+        elif self.pending and now - self.last_merge >= self.merge_interval: self.merge()
+
+        self.root.after(self.interval, self.poll)
+
+    def merge(self, positions = ()):
+        """
+        Insert the pending experiments into the campaign
+        and return the updated position and time labels.
+        """
+
+        # only the new records are sorted, later ones win as in a single file
+        new_campaign = Campaign(**concatenate_columns([chunk.to_columns() for chunk in self.pending]))
+        self.pending = []
+        self.campaign, indices = self.campaign.insert(new_campaign)
+
+        since = int(new_campaign.trace_times[0]) if len(new_campaign.trace_times) else None
+        position_labels = self.update_labels(self.campaign, positions, indices)
+        time_labels = self.create_time_labels(self.campaign, since)
+        self.last_merge = monotonic()
+        return position_labels, time_labels
+
+    def relayout(self):
+        positions = sorted(set(self.pending_positions))
+        self.pending_positions = []
+        position_labels, time_labels = self.merge(positions)
+
+        self.visualisation.replot(Runs.from_campaign(self.campaign), time_labels, position_labels,
+                                  self.location_information)
+        self.last_relayout = monotonic()
+
+class PositionResolver(object):
+    """
+    Resolver of bit positions in memory to the paths of the fields containing them,
+    e.g. 'list_head.next[3].value'.
+
+    The variable is looked up in the memory usage by bisection,
+    inside of it the substructures of the data structures are bisected
+    and the cells of arrays are found by their index.
+    The results of the recently resolved positions are cached,
+    so the graphical interface and the reports can resolve positions repeatedly.
+    """
+
+    def __init__(self, memory_usage, structures = None, cache_size = 1 << 16):
+        self.memory_usage = memory_usage
+        self.lowers = [position.lower for position, _ in memory_usage]
+        self.structures = structures or {}
+        self.resolve = lru_cache(cache_size)(self.find_path)
+
+    def find_path(self, position):
+        """
+        Return the pair of the path of the innermost field containing the given bit position
+        and the offset in bytes inside of it or None if the position is not inside of any variable.
+
+        Padding and unions, whose fields overlap, end the path.
+        """
+
+        index = bisect(self.lowers, position) - 1
+        if index < 0: return None
+        interval, name = self.memory_usage[index]
+        if position >= interval.upper: return None
+
+        path = [name]
+        offset = (position - interval.lower) // Memory.bits
+        structure = self.structures.get(name)
+
+        while isinstance(structure, Data) and not isinstance(structure, DataUnion):
+            if isinstance(structure, Array):
+                cell = structure.cell.structure
+                try: index = offset // cell.size
+                except (AttributeError, ZeroDivisionError): break
+                if index >= structure.count: break
+                path.append('[{:d}]'.format(index))
+                offset -= index * cell.size
+                structure = cell
+                continue
+
+            substructures = structure.substructures
+            index = substructures.bisect(offset) - 1
+            if index < 0: break
+            substructure_offset, substructure = substructures.peekitem(index)
+            try:
+                if offset >= substructure_offset + substructure.size: break
+            except AttributeError: break
+
+            if substructure.label: path.append('.' + substructure.label)
+            offset -= substructure_offset
+            structure = substructure.structure.structure
+
+        return ''.join(path), offset
+
+def position_information(time_labels, position_labels, register, x, y, interval, resolver = None):
     times, labels = zip(*time_labels)
     time_index = bisect(times, x)
-    if time_index:
+    # an empty label marks times outside of all binaries
+    if time_index and labels[time_index - 1]:
         name = labels[time_index - 1]
         injection_time = '{:d} in function {}'.format(x, name)
     else: injection_time = '{:d}'.format(x)
@@ -471,7 +1120,10 @@ def position_information(time_labels, position_labels, register, x, y, interval)
     else:
         bit_offset = y % Memory.bits
         injection_position = []
-        if groups:
+        field = resolver.resolve(y) if resolver is not None else None
+        if field is not None:
+            injection_position.append('in {} at offset 0x{:X}'.format(*field))
+        elif groups:
             while groups:
                 group = groups.pop()
                 injection_position.append('in {} '.format(group.header))
@@ -484,21 +1136,230 @@ def position_information(time_labels, position_labels, register, x, y, interval)
         injection_position = ''.join(injection_position)
     return 'injection position: {} | injection time: {}'.format(injection_position, injection_time)
 
+def create_statistics(campaign, register, position_labels, time_labels, clusters = None, resolver = None):
+    """
+    Return a list of title-statistics-pairs of the given campaign
+    for the whole campaign, each register or each cluster, structure
+    and, given a position resolver, each field, and each function.
+
+    The fault space of a group consists of all its bit positions
+    at all times of the campaign, except for functions,
+    whose fault space consists of all bit positions with experiments
+    at the times they are executed.
+    Experiments are attributed to the function executing at the last time of their interval,
+    where the injected fault is used.
+    """
+
+    statistics = []
+    if not len(campaign): return statistics
+
+    duration = int(campaign.ends.max()) - int(campaign.starts.min())
+    positions = campaign.positions
+
+    everything = numpy.zeros(len(campaign), numpy.int64)
+    statistics.append(('campaign', weighted_statistics(campaign, everything, ['all'],
+                                                       [len(campaign.bits) * duration], Result.count)))
+
+    if register:
+        groups = positions // Register.bits
+        groups[groups >= Register.count] = -1
+        names = [Register.show(number) for number in range(Register.count)]
+        statistics.append(('register', weighted_statistics(campaign, groups, names,
+                                                           [Register.bits * duration] * Register.count, Result.count)))
+    else:
+        shift = int(math.log2(Memory.bits))
+        if clusters is not None:
+            lowers = numpy.array([cluster.lower for cluster in clusters], numpy.int64)
+            uppers = numpy.array([cluster.upper for cluster in clusters], numpy.int64)
+            names = ['{}-{}'.format(Memory.show(lower >> shift), Memory.show((upper - 1) >> shift))
+                     for lower, upper in zip(lowers.tolist(), uppers.tolist())]
+            statistics.append(('cluster', weighted_statistics(campaign, interval_groups(positions, lowers, uppers),
+                                                              names, (uppers - lowers) * duration, Result.count)))
+
+        intervals = list(position_labels)
+        lowers = numpy.array([interval.lower for interval in intervals], numpy.int64)
+        uppers = numpy.array([interval.upper for interval in intervals], numpy.int64)
+        names = []
+        for interval in intervals:
+            headers = []
+            group = position_labels[interval].parent
+            while group is not None:
+                headers.append(group.header)
+                group = group.parent
+            names.append(' > '.join(reversed(headers)) or '(no structure)')
+        groups, names, numbers = merge_groups(interval_groups(positions, lowers, uppers), names)
+        sizes = merge_sizes((uppers - lowers) * duration, numbers, len(names))
+        statistics.append(('structure', weighted_statistics(campaign, groups, names, sizes, Result.count)))
+
+        if resolver is not None:
+            # the labelled intervals do not cross the borders of the innermost fields
+            names = []
+            for interval in intervals:
+                found = resolver.resolve(interval.lower)
+                names.append('(no field)' if found is None else found[0])
+            groups, names, numbers = merge_groups(interval_groups(positions, lowers, uppers), names)
+            sizes = merge_sizes((uppers - lowers) * duration, numbers, len(names))
+            statistics.append(('field', weighted_statistics(campaign, groups, names, sizes, Result.count)))
+
+    if time_labels:
+        times, names = zip(*time_labels)
+        times = numpy.array(times, numpy.int64)
+        end = max(int(campaign.ends.max()), int(times[-1]))
+        groups, names, numbers = merge_groups(numpy.searchsorted(times, campaign.ends - 1, 'right') - 1, list(names))
+        sizes = merge_sizes(numpy.diff(numpy.append(times, end)) * len(campaign.bits), numbers, len(names))
+        statistics.append(('function', weighted_statistics(campaign, groups, names, sizes, Result.count)))
+
+    return statistics
+
+def print_statistics(statistics):
+    for title, group_statistics in statistics:
+        print()
+        print('{:<40} {:>14} {:>10} {:>16}  {}'.format(title, 'covered', 'failures', 'extrapolated',
+                                                       ' '.join(Result.show(result) for result in range(Result.count))))
+        rows = zip(group_statistics.names, group_statistics.totals().tolist(),
+                   group_statistics.failure_probabilities(Result.OK).tolist(),
+                   group_statistics.extrapolated_failures(Result.OK).tolist(), group_statistics.weights.tolist())
+        for name, total, probability, failures, weights in rows:
+            if not total: continue
+            print('{:<40} {:>14d} {:>9.2%} {:>16.0f}  {}'.format(name, total, probability, failures,
+                                                                ' '.join(map(str, weights))))
+
+def write_report(statistics, filename, report_format = None):
+    """
+    Write the statistics into the given file
+    as csv or json depending on the given format or else the file extension.
+    """
+
+    if report_format is None:
+        if path.splitext(filename)[1].lower() == '.json': report_format = 'json'
+        else: report_format = 'csv'
+
+    result_names = [Result.show(result) for result in range(Result.count)]
+    with open(filename, 'w', newline = '') as report_file:
+        if report_format == 'json': write_json(statistics, report_file, result_names, Result.OK)
+        else: write_csv(statistics, report_file, result_names, Result.OK)
+
+def binary(string):
+    """
+    Return the pair of the filename and the base address given as 'FILE@BASE' or 'FILE'.
+
+    The base address may be written with a base prefix, e.g. '0x'.
+    """
+
+    filename, separator, base = string.rpartition('@')
+    if separator:
+        try: return filename, int(base, 0)
+        except ValueError: pass
+    return string, 0
+
+def window(string):
+    """
+    Return the pair of integers given as 'LOWER:UPPER'.
+
+    The integers may be written with a base prefix, e.g. '0x'.
+    """
+
+    try:
+        lower, upper = (int(bound, 0) for bound in string.split(':'))
+        if lower <= upper: return lower, upper
+    except ValueError: pass
+    raise ArgumentTypeError('not a window LOWER:UPPER: {}'.format(string))
+
 def parse_arguments():
     parser = ArgumentParser()
-    parser.add_argument("-b", "--binary",
-                        help = "object file of the tested code")
+    parser.add_argument("-b", "--binary", nargs = '+', type = binary,
+                        help = "object files of the tested code, each optionally loaded at a base address as FILE@BASE")
+    parser.add_argument("--source-lines", action = 'store_true',
+                        help = "label the times with the source lines from the DWARF line tables of the binaries when zoomed in")
     parser.add_argument("-t", "--symbol-table",
                         help = "symbol table of the tested code")
     parser.add_argument("-u", "--memory-usage",
-                        help = "file with information about the position of data structures in memory")
+                        help = "file with information about the position of data structures in memory, by default the variables of the binaries")
     parser.add_argument("-s", "--data-structures",
                         help = "file with information about the structure of data structures in memory")
-    parser.add_argument("-d", "--data", required = True,
-                        help = "csv file with the test results")
+    parser.add_argument("--debug-structures", action = 'store_true',
+                        help = "take the structure of data structures in memory from the DWARF debugging information of the binaries")
+    parser.add_argument("-d", "--data", nargs = '+',
+                        help = "csv files with the test results or directories containing them")
+    parser.add_argument("--database",
+                        help = "SQLite database with the test results to use instead of csv files")
+    parser.add_argument("--import-database",
+                        help = "write the test results into the given SQLite database and exit")
+    parser.add_argument("--address-window", type = window,
+                        help = "only load or list the experiments on the memory addresses LOWER:UPPER")
+    parser.add_argument("--time-window", type = window,
+                        help = "only load or list the experiments intersecting the times LOWER:UPPER")
+    parser.add_argument("--list-experiments", action = 'store_true',
+                        help = "print the experiments inside the address and time windows and exit")
     parser.add_argument("-r", "--register", action = 'store_true',
                         help = "show visualisation for register instead of memory")
-    return parser.parse_args()
+    parser.add_argument("-c", "--classification-rules",
+                        default = path.join(path.dirname(path.abspath(__file__)), 'classification_rules.csv'),
+                        help = "csv file with the rules classifying the experiment outputs")
+    parser.add_argument("--rebuild-cache", action = 'store_true',
+                        help = "parse the test results and symbol tables again even if they are cached")
+    parser.add_argument("-m", "--memory-budget", type = int, default = 1024,
+                        help = "approximate memory in MiB used for parsing the test results")
+    parser.add_argument("-j", "--jobs", type = int, default = 1,
+                        help = "number of processes parsing the test results")
+    parser.add_argument("-f", "--follow", action = 'store_true',
+                        help = "keep reading test results appended to the csv file")
+    parser.add_argument("--follow-interval", type = int, default = 1000,
+                        help = "milliseconds between reads of appended test results")
+    parser.add_argument("--classification-statistics", action = 'store_true',
+                        help = "print how many experiments each classification rule decided")
+    parser.add_argument("--statistics", action = 'store_true',
+                        help = "print the result statistics weighted by fault space points per register, cluster, structure and function")
+    parser.add_argument("--report",
+                        help = "write the weighted result statistics into the given csv or json file and exit")
+    parser.add_argument("--report-format", choices = ('csv', 'json'),
+                        help = "format of the report, by default given by the file extension")
+    parser.add_argument("--unmatched-outputs", action = 'store_true',
+                        help = "print the distinct experiment outputs not matched by any classification rule, parses the test results again")
+    arguments = parser.parse_args()
+
+    if (arguments.data is None) == (arguments.database is None):
+        parser.error('exactly one of the arguments -d/--data and --database is required')
+    if arguments.source_lines and arguments.binary is None:
+        parser.error('argument --source-lines needs the binaries given with -b/--binary')
+    if arguments.debug_structures and arguments.binary is None:
+        parser.error('argument --debug-structures needs the binaries given with -b/--binary')
+    if arguments.debug_structures and arguments.data_structures is not None:
+        parser.error('argument --debug-structures is not allowed with -s/--data-structures')
+    if arguments.unmatched_outputs and arguments.database is not None:
+        parser.error('argument --unmatched-outputs needs csv files with test results')
+    if arguments.follow and arguments.database is not None:
+        parser.error('argument -f/--follow needs csv files with test results')
+    if arguments.register and arguments.address_window is not None:
+        parser.error('argument --address-window is only valid for memory test results')
+    return arguments
+
+class Progress(object):
+    """
+    Progress display of a long running stage.
+
+    Rewrite the current line at most once per interval
+    with the fraction done, the rows per second and the estimated remaining time.
+    """
+
+    def __init__(self, description, interval = 1.0):
+        self.description = description
+        self.interval = interval
+        self.start = self.last = monotonic()
+
+    def __call__(self, done, total, rows):
+        now = monotonic()
+        if now - self.last < self.interval: return
+        self.last = now
+
+        elapsed = now - self.start
+        if done: remaining = int(elapsed * (total - done) / done)
+        else: remaining = 0
+
+        print('\r{} ... {:5.1f}% {:d} rows {:.0f} rows/s ETA {:d}:{:02d}:{:02d}'.format(
+              self.description, 100.0 * done / max(total, 1), rows, rows / elapsed,
+              remaining // 3600, remaining // 60 % 60, remaining % 60), end = ' ')
+        stdout.flush()
 
 def print_status(description, function, *arguments, **keyword_arguments):
     print(description, '...', end = ' ')
@@ -508,50 +1369,155 @@ def print_status(description, function, *arguments, **keyword_arguments):
     stdout.flush()
     return result
 
+def print_classification_statistics(classifier):
+    for rule, hits in classifier.statistics():
+        if rule is None: print('{:>12d}  (no rule matched)'.format(hits))
+        else: print('{:>12d}  {:<24} {}'.format(hits, Result.show(rule.result), rule.pattern))
+
+def print_experiments(campaign, index, data_class, positions = None, times = None, resolver = None):
+    lower, upper = positions or (- (1 << 62), 1 << 62)
+    start, end = times or (- (1 << 62), 1 << 62)
+    for number in index.query(lower, upper, start, end).tolist():
+        position = int(campaign.positions[number])
+        line = '{} bit {:d}\t{:d}\t{:d}\t{}'.format(data_class.show(position // data_class.bits), position % data_class.bits,
+                                                  int(campaign.starts[number]), int(campaign.ends[number]),
+                                                  Result.show(int(campaign.results[number])))
+
+        # the field containing the position if it is inside of a variable
+        field = resolver.resolve(position) if resolver is not None else None
+        if field is not None: line += '\t{} + 0x{:X}'.format(*field)
+        print(line)
+
+def read_memory_layout(arguments):
+    """
+    Return the pair of the memory usage and the dictionary of the data structures given by the arguments.
+    """
+
+    if arguments.debug_structures:
+        structures = print_status('read debugging information',
+                                   read_debug_structures, arguments.binary)
+    else:
+        structures = print_status('parse data structures',
+                                   parse_structures, arguments.data_structures, arguments.rebuild_cache)
+
+    if arguments.memory_usage is None and arguments.binary is not None:
+        memory_usage = print_status('read memory usage from the symbol tables',
+                                     read_memory_usage, arguments.binary, structures)
+    else:
+        memory_usage = print_status('parse memory usage data',
+                                     parse_memory_usage_data, arguments.memory_usage)
+
+    return memory_usage, structures
+
+def print_unmatched_outputs(classifier):
+    for output, count in classifier.unmatched_outputs():
+        print('{:>12d}  {!r}'.format(count, output))
+
 def main():
     arguments = parse_arguments()
 
-    if arguments.register:
-        data, trace = print_status('parse register test results',
-                                    parse_results, arguments.data, Register)
+    classifier = print_status('read classification rules',
+                              read_classification_rules, arguments.classification_rules, Result,
+                              arguments.unmatched_outputs)
+    lookup('classifications', cache_key(*classifier.memo_key()), classifier.load_memo)
+
+    # a block of csv text takes about ten times its size once split into fields,
+    # the rest of the budget is left for the decoded arrays
+    block_size = max((arguments.memory_budget << 20 >> 4) // max(arguments.jobs, 1), 1 << 20)
+
+    if arguments.register: data_class, kind = Register, 'register'
+    else: data_class, kind = Memory, 'memory'
+
+    if arguments.address_window is None: positions = None
+    else: positions = tuple(address * Memory.bits for address in arguments.address_window)
+
+    if arguments.database is not None:
+        try: database_kind = read_database_kind(arguments.database)
+        except ValueError: raise SystemExit('{} is not a campaign database'.format(arguments.database))
+        if database_kind != data_class.__name__:
+            raise SystemExit('the database {} contains no {} test results'.format(arguments.database, kind))
+        campaign = print_status('load {} test results from database'.format(kind),
+                                load_database, arguments.database, positions, arguments.time_window)
+    elif arguments.follow:
+        filenames = result_files(arguments.data)
+        if len(filenames) != 1: raise SystemExit('--follow needs exactly one csv file with test results')
+        # the follower loads the records written so far and continues after them
+        follower = ResultFollower(filenames[0], data_class, classifier, block_size)
+        campaign = print_status('parse {} test results'.format(kind),
+                                follower.load, path.getsize(filenames[0]))
+    else:
+        # the classification only runs when the test results are parsed, not when they are cached
+        campaign = load_campaign(arguments.data, data_class, classifier, 'parse {} test results'.format(kind),
+                                 rebuild_cache = arguments.rebuild_cache or arguments.unmatched_outputs
+                                                 or arguments.classification_statistics,
+                                 block_size = block_size, jobs = arguments.jobs)
+
+    if classifier.learned:
+        store('classifications', cache_key(*classifier.memo_key()), classifier, Classifier.save_memo)
+        classifier.learned.clear()
+
+    if arguments.import_database is not None:
+        print_status('import {} test results into database'.format(kind),
+                     create_database, arguments.import_database, campaign, data_class.__name__)
+        return
+
+    if arguments.list_experiments:
+        index = print_status('index experiments',
+                             IntervalIndex.from_campaign, campaign)
+        resolver = None if arguments.register else PositionResolver(*read_memory_layout(arguments))
+        print_experiments(campaign, index, data_class, positions, arguments.time_window, resolver)
+        return
 
+    if arguments.register:
         position_labels = print_status('create register labels',
                                         create_register_labels)
 
+        resolver = None
         mirror = False
 
     else:
-        memory_usage = print_status('parse memory usage data',
-                                     parse_memory_usage_data, arguments.memory_usage)
-
-        structures = print_status('parse data structures',
-                                   parse_structures, arguments.data_structures)
-
-        data, trace = print_status('parse memory test results',
-                                    parse_results, arguments.data, Memory)
+        memory_usage, structures = read_memory_layout(arguments)
+        resolver = PositionResolver(memory_usage, structures)
 
         clusters = print_status('generate clusters',
-                                 generate_clusters, iter(sorted(data.keys())))
+                                 SortedList, generate_clusters(iter(campaign.keys())))
 
         position_labels = print_status('create memory labels',
-                                        create_memory_labels, clusters, memory_usage, structures)
+                                        create_memory_labels, iter(clusters), memory_usage, structures)
 
         mirror = True
 
+    if arguments.classification_statistics:
+        if arguments.database is not None: print('classification statistics are not available for a database')
+        else: print_classification_statistics(classifier)
+    if arguments.unmatched_outputs:
+        print_unmatched_outputs(classifier)
+
     time_labels = {}
     symbol_table = None
 
     if arguments.binary is not None:
         symbol_table = print_status('create symbol table',
-                                     create_symbol_table, arguments.binary)
+                                     create_symbol_tables, arguments.binary, arguments.rebuild_cache, arguments.jobs)
 
     if arguments.symbol_table is not None:
         symbol_table = print_status('read symbol table',
-                                     read_symbol_table, arguments.symbol_table)
+                                     read_symbol_table, arguments.symbol_table, arguments.rebuild_cache)
 
     if symbol_table is not None:
         time_labels = print_status('create time labels',
-                                    create_time_labels, trace, symbol_table)
+                                    create_time_labels, campaign.trace_times, campaign.trace_pointers, symbol_table)
+
+    if arguments.statistics or arguments.report is not None:
+        statistics = print_status('compute statistics',
+                                  create_statistics, campaign, arguments.register, position_labels, time_labels,
+                                  None if arguments.register else clusters, resolver)
+        if arguments.statistics: print_statistics(statistics)
+
+    if arguments.report is not None:
+        print_status('write report',
+                     write_report, statistics, arguments.report, arguments.report_format)
+        return
 
     color_map = {
         Result.OK:                       'green',
@@ -573,14 +1539,82 @@ def main():
         Result.OTHER_ERROR:              'other error'
     }
 
+    line_table = None
+    line_labels = []
+
+    if arguments.source_lines:
+        line_table = print_status('create line table',
+                                  create_line_tables, arguments.binary, arguments.rebuild_cache, arguments.jobs)
+        line_labels = print_status('create source line labels',
+                                   create_line_labels, campaign.trace_times, campaign.trace_pointers, line_table)
+
+    def location_information(x, y, interval):
+        information = position_information(time_labels, position_labels, arguments.register, x, y, interval, resolver)
+        results = indexed_results[index.covering(y, x)].tolist()
+        if results: information += ' | result: ' + ', '.join(explanation[result] for result in results)
+
+        if line_table is not None:
+            # the instruction executed at the time
+            trace_index = numpy.searchsorted(trace_times, x, 'right') - 1
+            if trace_index >= 0:
+                row = line_table.rows([trace_pointers[trace_index]])[0]
+                if row >= 0: information += ' | source: ' + line_table.location(row)
+
+        return information
+
+    # the graphical interface is only imported here, so the other modes run without a display
+    from tkinter import Tk
+    from graphical_interface import Visualisation
+
+    runs = print_status('merge experiment runs',
+                        Runs.from_campaign, campaign)
+
+    # only the trace is needed besides the runs,
+    # the experiments are kept only to insert new ones into them
+    trace_times, trace_pointers = campaign.trace_times, campaign.trace_pointers
+    if arguments.follow:
+        index = print_status('index experiments',
+                             IntervalIndex.from_campaign, campaign)
+        indexed_results = campaign.results
+    else:
+        index = print_status('index experiment runs',
+                             IntervalIndex.from_runs, runs)
+        indexed_results = runs.results
+        campaign = None
+
     root = Tk()
 
     visualisation = print_status('create visualisation frame',
-                                 Visualisation, root, data, color_map, explanation, time_labels, position_labels,
-                                 lambda x, y, interval: position_information(time_labels, position_labels, arguments.register, x, y, interval), mirror)
+                                 Visualisation, root, runs, color_map, explanation, time_labels, position_labels,
+                                 location_information, mirror, line_labels)
 
     visualisation.mainframe.grid(column = 0, row = 0, sticky = 'nsew')
 
+    if arguments.follow:
+        def update_labels(new_campaign, positions, indices):
+            nonlocal campaign, index, indexed_results
+            index = index.inserted(new_campaign, indices)
+            campaign, indexed_results = new_campaign, new_campaign.results
+            if not arguments.register and positions:
+                relabel_memory(campaign, positions, clusters, position_labels, memory_usage, structures)
+            return position_labels
+
+        def update_time_labels(campaign, since):
+            nonlocal time_labels, line_labels, trace_times, trace_pointers
+            trace_times, trace_pointers = campaign.trace_times, campaign.trace_pointers
+            if since is None: return time_labels
+            if symbol_table is not None:
+                time_labels = extend_time_labels(time_labels, trace_times, trace_pointers, since,
+                                                 create_time_labels, symbol_table)
+            if line_table is not None:
+                line_labels = extend_time_labels(line_labels, trace_times, trace_pointers, since,
+                                                 create_line_labels, line_table)
+                visualisation.set_detail_time_labels(line_labels)
+            return time_labels
+
+        LiveView(root, visualisation, campaign, follower, update_labels, update_time_labels, location_information,
+                 interval = arguments.follow_interval)
+
     root.columnconfigure( 0, weight = 1 )
     root.rowconfigure(    0, weight = 1 )
     root.mainloop()
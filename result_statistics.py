@@ -0,0 +1,145 @@
+import csv
+import json
+
+import numpy
+
+class Statistics(object):
+    """
+    Weighted result statistics of the experiments of a campaign per group.
+
+    Each experiment stands for the time2 - time1 fault space points
+    of its def/use equivalence class, so it is weighted with that length.
+
+    Attributes:
+      names   - list of the group names
+      weights - array of the weighted number of experiments per group and result constant
+      sizes   - array of the number of fault space points per group
+    """
+
+    def __init__(self, names, weights, sizes):
+        self.names = names
+        self.weights = weights
+        self.sizes = sizes
+
+    def totals(self):
+        """
+        Return the array of the fault space points covered by experiments per group.
+        """
+
+        return self.weights.sum(axis = 1)
+
+    def failure_probabilities(self, correct):
+        """
+        Return the array of the probabilities per group
+        that a fault leads to a result other than the given correct one.
+        """
+
+        totals = self.totals()
+        failures = totals - self.weights[:, correct]
+        return numpy.divide(failures, totals, out = numpy.zeros(len(totals)), where = totals > 0)
+
+    def extrapolated_failures(self, correct):
+        """
+        Return the array of the expected number of failing fault space points per group
+        assuming uncovered points fail with the probability of the covered ones.
+        """
+
+        return self.failure_probabilities(correct) * self.sizes
+
+    def rows(self, result_names, correct):
+        """
+        Return an iterator over dictionaries describing the groups covered by experiments.
+        """
+
+        columns = zip(self.names, self.totals().tolist(), self.sizes.tolist(),
+                      self.failure_probabilities(correct).tolist(),
+                      self.extrapolated_failures(correct).tolist(), self.weights.tolist())
+        for name, total, size, probability, failures, weights in columns:
+            if not total: continue
+            yield { 'group'                 : name
+                  , 'covered'               : total
+                  , 'fault_space'           : size
+                  , 'failure_probability'   : probability
+                  , 'extrapolated_failures' : failures
+                  , 'results'               : dict(zip(result_names, weights))
+                  }
+
+def weighted_statistics(campaign, groups, names, sizes, result_count):
+    """
+    Return the statistics of the experiments of the campaign
+    for the given group numbers per experiment.
+
+    Arguments:
+      groups - array of the group number of each experiment, negative to leave it out
+      names  - list of the group names indexed by group number
+      sizes  - array of the fault space points of each group
+      result_count - number of result constants
+    """
+
+    included = groups >= 0
+    keys = groups[included] * result_count + campaign.results[included]
+    # starts hold time1 - 1 for plotting, the class itself spans time2 - time1 points
+    lengths = campaign.ends[included].astype(numpy.int64) - campaign.starts[included] - 1
+
+    # integer accumulation stays exact where float weights would round
+    weights = numpy.zeros(len(names) * result_count, numpy.int64)
+    numpy.add.at(weights, keys, lengths)
+    return Statistics(names, weights.reshape(len(names), result_count), numpy.asarray(sizes, numpy.int64))
+
+def interval_groups(positions, lowers, uppers):
+    """
+    Return the number of the interval containing each position
+    or -1 for positions outside of all intervals.
+
+    The intervals have to be sorted and must not overlap.
+    """
+
+    groups = numpy.searchsorted(lowers, positions, 'right') - 1
+    outside = (groups < 0) | (positions >= numpy.asarray(uppers)[numpy.maximum(groups, 0)])
+    groups[outside] = -1
+    return groups
+
+def merge_groups(groups, names):
+    """
+    Return the group numbers and the list of group names
+    combining all groups of the same name.
+    """
+
+    unique_names, numbers = numpy.unique(numpy.array(names, object), return_inverse = True)
+    merged = numpy.full(len(groups), -1, numpy.int64)
+    included = groups >= 0
+    merged[included] = numbers[groups[included]]
+    return merged, unique_names.tolist(), numbers
+
+def merge_sizes(sizes, numbers, count):
+    """
+    Return the sizes of merged groups given the sizes of the original groups
+    and the numbers of the merged groups they belong to.
+    """
+
+    merged = numpy.zeros(count, numpy.int64)
+    numpy.add.at(merged, numbers, numpy.asarray(sizes, numpy.int64))
+    return merged
+
+def write_csv(statistics, report_file, result_names, correct):
+    """
+    Write the given title-statistics-pairs as one csv table into the file.
+    """
+
+    fields = ['grouping', 'group', 'covered', 'fault_space', 'failure_probability', 'extrapolated_failures']
+    writer = csv.writer(report_file)
+    writer.writerow(fields + list(result_names))
+    for title, group_statistics in statistics:
+        for row in group_statistics.rows(result_names, correct):
+            row['grouping'] = title
+            writer.writerow([row[field] for field in fields] + [row['results'][name] for name in result_names])
+
+def write_json(statistics, report_file, result_names, correct):
+    """
+    Write the given title-statistics-pairs as a json object
+    mapping each title to the list of its groups into the file.
+    """
+
+    json.dump({ title : list(group_statistics.rows(result_names, correct))
+                for title, group_statistics in statistics }, report_file, indent = 2)
+    report_file.write('\n')
@@ -1,49 +1,71 @@
+import re
+import gc
+import pickle
+from os import path
+from bisect import bisect
+from zlib import crc32
 from string import ascii_letters, digits
-from collections import namedtuple, Counter
+from collections import namedtuple, Counter, deque
+from collections.abc import Mapping
 from sortedcontainers import SortedDict
 
 identifier = 0
 
 class SizeSelector(object):
-    def __init__(self, scale = 1, sizes = None):
-        if isinstance(scale, int) and scale: self.scale = scale
-        else: self.scale = 1
-        if isinstance(sizes, Counter): self.sizes = sizes
-        else: self.sizes = Counter()
+    """
+    Estimate of an unknown size.
+
+    The possible sizes lie between a lower and an optional upper bound.
+    The sizes suggested by the surrounding structures are counted,
+    the most often suggested possible size is the estimate,
+    the smallest one of several suggested equally often.
+    """
+
+    def __init__(self):
+        self.sizes = Counter()
+        self.lower = 0
+        self.upper = None
+
+    def possible(self, size):
+        return self.lower <= size and (self.upper is None or size <= self.upper)
+
+    @property
+    def determined(self):
+        return self.lower == self.upper
 
     @property
     def no_estimate_possible(self):
-        if self.sizes: return False
-        return True
+        return not self.determined and not any(map(self.possible, self.sizes))
 
     @property
     def size_estimate(self):
-        most_common = self.sizes.most_common()
-        estimate, rate = most_common[0]
-        for size, count in most_common[1:]:
-            if count != rate: break
-            if size < estimate: estimate = size
-
-        return self.scale * estimate
+        if self.determined: return self.lower
+        count, size = max((count, -size) for size, count in self.sizes.items() if self.possible(size))
+        return -size
 
     def add_possible_size(self, size):
         assert isinstance(size, int)
-        self.sizes.update([size // self.scale])
+        self.sizes[size] += 1
 
     def remove_possible_sizes_above(self, limit):
+        """
+        Return whether the upper bound changed.
+        """
+
         assert isinstance(limit, int)
-        assert all( isinstance(size, int) for size in self.sizes.keys() )
-        self.sizes = Counter(filter(lambda size: size <= limit, self.sizes.elements()))
+        if self.upper is not None and self.upper <= limit: return False
+        self.upper = limit
+        return True
 
     def remove_possible_sizes_below(self, limit):
-        assert isinstance(limit, int)
-        assert all( isinstance(size, int) for size in self.sizes.keys() )
-        self.sizes = Counter(filter(lambda size: size >= limit, self.sizes.elements()))
+        """
+        Return whether the lower bound changed.
+        """
 
-    def scaled_selector(self, scale):
-        assert isinstance(scale, int)
-        assert all( isinstance(size, int) for size in self.sizes.keys() )
-        return SizeSelector(self.scale * scale, self.sizes)
+        assert isinstance(limit, int)
+        if self.lower >= limit: return False
+        self.lower = limit
+        return True
 
 class Structure(object):
     def __init__(self, size = None):
@@ -96,6 +118,15 @@ class Structure(object):
     def possible_size_known(self):
         return self.size_known or not self.presize.no_estimate_possible
 
+    @property
+    def size_bounds(self):
+        """
+        Pair of the lower and the upper bound of the size, the upper one None if there is none.
+        """
+
+        if self.size_known: return self.presize, self.presize
+        return self.presize.lower, self.presize.upper
+
     def add_possible_size(self, size):
         assert isinstance(size, int)
         if not self.size_known:
@@ -104,24 +135,76 @@ class Structure(object):
         else: assert self.size <= size
 
     def remove_possible_sizes_above(self, limit):
+        """
+        Return whether the bounds of the size changed.
+        """
+
         assert isinstance(limit, int)
-        if not self.size_known:
-            assert isinstance(self.presize, SizeSelector)
-            self.presize.remove_possible_sizes_above(limit)
-        else: assert self.size <= limit
+        if self.size_known:
+            assert self.size <= limit
+            return False
+        assert isinstance(self.presize, SizeSelector)
+        return self.settle_size(self.presize.remove_possible_sizes_above(limit))
 
     def remove_possible_sizes_below(self, limit):
+        """
+        Return whether the bounds of the size changed.
+        """
+
         assert isinstance(limit, int)
-        if not self.size_known:
-            assert isinstance(self.presize, SizeSelector)
-            self.presize.remove_possible_sizes_below(limit)
-        else: assert self.size >= limit
+        if self.size_known:
+            assert self.size >= limit
+            return False
+        assert isinstance(self.presize, SizeSelector)
+        return self.settle_size(self.presize.remove_possible_sizes_below(limit))
+
+    def settle_size(self, changed):
+        # the size is known once both bounds meet
+        if changed and self.presize.determined: self.size = self.presize.lower
+        return changed
+
+    @property
+    def size_owner(self):
+        """
+        Object shared by all structures sharing the size of this one.
+        """
+
+        return self
 
     def same(self, other):
         if self is other: return True
         if type(self) is not type(other): return False
         if self.size_known and other.size_known and self.size != other.size: return False
 
+    @property
+    def kind(self):
+        return type(self).__name__
+
+    def signatures(self, query = False):
+        """
+        Return the hashable signatures of the structure for a StructureIndex.
+
+        If two structures are the same, a query signature of the one
+        is among the stored signatures of the other.
+        """
+
+        return [(self.kind,)]
+
+    def outline(self):
+        """
+        Return a hashable outline of the structure without the substructures of data structures.
+
+        Anonymous data structures are outlined as '#'.
+        If two structures are the same and neither outline contains '#', their outlines are equal.
+        """
+
+        return (self.kind,)
+
+    def __reduce_ex__(self, protocol):
+        # the structure void is stored by its name, so it stays unique
+        if self is void: return 'void'
+        return super().__reduce_ex__(protocol)
+
 void = Structure(0)
 
 class Data(Structure):
@@ -142,6 +225,7 @@ class Data(Structure):
 
         try: self.substructures
         except AttributeError: self.substructures = SortedDict()
+        self.shape = 0
         if isinstance(substructures, list):
             for substructure in substructures:
                 self.add_substructure(substructure)
@@ -166,42 +250,44 @@ class Data(Structure):
             except IndexError: assert not self.size_known or self.size >= substructure.offset + substructure.size
 
         self.substructures[substructure.offset] = substructure
+        self.shape = (self.shape + substructure.shape) & 0xffffffff
 
-    def add_possible_size(self, size):
-        assert isinstance(size, int)
-        super().add_possible_size(size)
-        self.annotate_size()
+    # the substructures are stored as a plain list and only sorted again when used,
+    # building the sorted dictionaries of all loaded structures took most of the loading time
 
-    def annotate_size(self):
-        if self.substructures:
-            substructures = reversed(self.substructures.values())
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if isinstance(state.get('substructures'), SortedDict):
+            state['stored_substructures'] = list(state.pop('substructures').values())
+        return state
 
-            last_substructure = next(substructures)
-            last_done = self.annotate_size_of_last_substructure(last_substructure)
-            upper_bound = last_substructure.offset
+    def __setstate__(self, state):
+        self.__dict__.update(state)
 
-            for substructure in substructures:
-                possible_size = upper_bound - substructure.offset
-                substructure.remove_possible_sizes_above(possible_size)
-                substructure.add_possible_size(possible_size)
-                upper_bound = substructure.offset
-
-            self.annotate_size = lambda: self.annotate_size_of_last_substructure(last_substructure)
-        self.annotate_size = lambda: None
-
-    def annotate_size_of_last_substructure(self, substructure):
-        assert isinstance(substructure, Substructure)
+    def __getattr__(self, name):
+        if name != 'substructures' or 'stored_substructures' not in self.__dict__: raise AttributeError(name)
+        stored_substructures = self.__dict__.pop('stored_substructures')
+        self.substructures = SortedDict(zip([substructure.offset for substructure in stored_substructures],
+                                            stored_substructures))
+        return self.substructures
 
-        if substructure.size_known:
-            assert isinstance(substructure.presize, int)
-            self.remove_possible_sizes_below(substructure.offset + substructure.size)
-        elif self.size_known:
-            assert isinstance(self.presize, int)
-            possible_size = self.size - substructure.offset
-            substructure.remove_possible_sizes_above(possible_size)
-            substructure.add_possible_size(possible_size)
-        else: return
-        self.annotate_size = self.annotate_size_of_last_substructure = lambda: None
+    @property
+    def kind(self):
+        return 'data'
+
+    def signatures(self, query = False):
+        # named structures are the same by name, anonymous ones by their shape
+        signatures = [('data', self.full_name.rpartition(' ')[2])]
+        shape = len(self.substructures), self.shape
+        anonymous = '#' in self.name
+        if query or anonymous: signatures.append(('anonymous', shape))
+        if query and anonymous or not query and not anonymous: signatures.append(('named', shape))
+        return signatures
+
+    def outline(self):
+        # named structures are only the same as anonymous ones or by name
+        if '#' in self.name: return ('#',)
+        return ('data', self.name)
 
     def same(self, other):
         if self is other: return True
@@ -248,31 +334,7 @@ class DataUnion(Data):
         assert isinstance(substructure, Substructure)
         assert not substructure.offset
         self.substructures.append(substructure)
-
-    def annotate_size(self):
-        if self.size_known:
-            assert isinstance(self.presize, int)
-            for substructure in self.substructures:
-                substructure.remove_possible_sizes_above(self.size)
-                substructure.add_possible_size(self.size)
-            self.annotate_size = lambda: None
-
-        else:
-            biggest_size = 0
-            for substructure in self.substurctures:
-                assert not substructure.offset
-                if substructure.size_known:
-                    assert isinstance(substructure.presize, int)
-                    biggest_size = max(substructure.size, biggest_size)
-                else:
-                    biggest_size = None
-                    break
-            if biggest_size is not None:
-                self.remove_possible_sizes_below(biggest_size)
-                self.add_possible_size(biggest_size)
-                self.annotate_size = lambda: None
-
-    def annotate_size_of_last_substructure(self, substructure): pass
+        self.shape = (self.shape + substructure.shape) & 0xffffffff
 
 class Array(Data):
     def __init__(self, cell, count = 0, size = None):
@@ -280,7 +342,7 @@ class Array(Data):
         self.cell = cell
         if isinstance(count, int): self.count = count
         else: self.count = 0
-        if isinstance(size, int): self.cell.size = size // self.count
+        if isinstance(size, int): self.size = size
         self.extra_name = '[{:d}]'.format(self.count)
         self.name = self.cell.description() + self.extra_name
 
@@ -292,9 +354,12 @@ class Array(Data):
         descriptors.append(self.cell.description(label))
         return ' '.join(descriptors) + self.extra_name
 
+    # the size of an array is given by the size of its cells,
+    # an array without cells has no size
+
     @property
     def size_known(self):
-        return self.cell.structure.size_known
+        return not self.count or self.cell.structure.size_known
 
     @size_known.setter
     def size_known(self, boolean):
@@ -303,34 +368,127 @@ class Array(Data):
 
     @property
     def presize(self):
-        if isinstance(self.cell.structure.presize, SizeSelector):
-            return self.cell.structure.presize.scaled_selector(self.count)
+        if not self.count: return 0
         assert isinstance(self.cell.structure.presize, int)
         return self.cell.structure.presize * self.count
 
-    @presize.setter
-    def presize(self, size):
+    @property
+    def size(self):
+        if not self.count: return 0
+        return self.cell.structure.size * self.count
+
+    @size.setter
+    def size(self, size):
+        assert isinstance(size, int)
+        if self.count: self.cell.structure.size = size // self.count
+        else: assert not size
+
+    @property
+    def possible_size_known(self):
+        return not self.count or self.cell.structure.possible_size_known
+
+    @property
+    def size_bounds(self):
+        if not self.count: return 0, 0
+        lower, upper = self.cell.structure.size_bounds
+        return lower * self.count, None if upper is None else upper * self.count
+
+    def add_possible_size(self, size):
         assert isinstance(size, int)
-        self.cell.structure.presize = size // self.count
+        if self.count: self.cell.structure.add_possible_size(size // self.count)
+
+    def remove_possible_sizes_above(self, limit):
+        assert isinstance(limit, int)
+        if not self.count: return False
+        return self.cell.structure.remove_possible_sizes_above(limit // self.count)
+
+    def remove_possible_sizes_below(self, limit):
+        assert isinstance(limit, int)
+        if not self.count: return False
+        return self.cell.structure.remove_possible_sizes_below(-(-limit // self.count))
+
+    @property
+    def size_owner(self):
+        return self.cell.structure.size_owner
 
     @property
     def substructures(self):
-        substructures = SortedDict()
-        for x in range(self.count):
-            cell_offset = x * self.cell.structure.size
-            substructures[cell_offset] = Substructure(self.cell, offset = cell_offset)
-        return substructures
+        return ArrayCells(self.cell, self.count)
 
     def add_substructure(self, substructure): pass
 
-    def annotate_size(self): pass
-    def annotate_size_of_last_substructure(self, substructure): pass
+    @property
+    def kind(self):
+        return 'array'
+
+    def signatures(self, query = False):
+        return [('array', self.count) + signature for signature in self.cell.signatures(query)]
+
+    def outline(self):
+        return ('array', self.count) + self.cell.outline()
 
     def same(self, other):
         same = Structure.same(self, other)
         if same is not None: return same
         return self.count == other.count and self.cell.same(other.cell)
 
+class ArrayCells(Mapping):
+    """
+    Mapping from offsets to the cells of an array
+    like the SortedDict of the substructures of other data structures.
+
+    The substructures of the cells are computed from their index when accessed,
+    so the cells of big arrays are not all created.
+    Cells without a size all start at offset 0, so they collapse into a single cell.
+    """
+
+    def __init__(self, cell, count):
+        self.cell = cell
+        self.count = count
+
+    def __len__(self):
+        structure = self.cell.structure
+        if self.count and structure.size_known and not structure.size: return 1
+        return self.count
+
+    def __iter__(self):
+        if not self.count: return iter(())
+        size = self.cell.structure.size
+        if not size: return iter((0,))
+        return iter(range(0, self.count * size, size))
+
+    def __contains__(self, offset):
+        if not self.count: return False
+        size = self.cell.structure.size
+        if not size: return offset == 0
+        index, rest = divmod(offset, size)
+        return not rest and 0 <= index < self.count
+
+    def __getitem__(self, offset):
+        if offset not in self: raise KeyError(offset)
+        return Substructure(self.cell, offset = offset)
+
+    def bisect(self, offset):
+        """
+        Return the index of the first cell starting after the given offset.
+        """
+
+        if not self.count: return 0
+        size = self.cell.structure.size
+        if not size: return int(offset >= 0)
+        return min(max(offset // size + 1, 0), self.count)
+
+    def peekitem(self, index = -1):
+        """
+        Return the pair of the offset and the substructure of the cell with the given index.
+        """
+
+        count = len(self)
+        if index < 0: index += count
+        if not 0 <= index < count: raise IndexError('cell index out of range')
+        offset = index * self.cell.structure.size
+        return offset, Substructure(self.cell, offset = offset)
+
 class Pointer(Structure):
     pointer_size = SizeSelector()
     pointer_size_known = False
@@ -365,13 +523,28 @@ class Pointer(Structure):
         assert isinstance(size, int)
         type(self).pointer_size = size
 
+    @property
+    def size_owner(self):
+        return type(self)
+
     def same(self, other):
         same = Structure.same(self, other)
         if same is not None: return same
         return self.destination.same(other.destination)
 
+    def signatures(self, query = False):
+        return [(self.kind,) + signature for signature in self.destination.signatures(query)]
+
+    def outline(self):
+        return (self.kind,) + self.destination.outline()
+
 class Reference(Pointer):
-    def description(self): return self.destination.description() + ' &'
+    def description(self, label = None, specifiers = None):
+        descriptors = [self.destination.description(), '&']
+
+        if specifiers is not None: descriptors.append(specifiers)
+        if label is not None: descriptors.append(label)
+        return ' '.join(descriptors)
 
 class Function(Structure):
     def __init__(self, return_type = None, argument_types = None, size = None):
@@ -407,11 +580,29 @@ class Function(Structure):
     def same(self, other):
         same = Structure.same(self, other)
         if same is not None: return same
+        if len(self.argument_types) != len(other.argument_types): return False
         if not self.return_type.same(other.return_type): return False
         return all(self_argument_type.same(other_argument_type)
                    for self_argument_type, other_argument_type
                    in zip(self.argument_types, other.argument_types))
 
+    def signatures(self, query = False):
+        # functions without anonymous data structures are the same by their outline,
+        # like named data structures, the others by their number of arguments
+        outline = self.outline()
+        arity = len(self.argument_types)
+        if '#' in outline:
+            signatures = [('anonymous function', arity)]
+            if query: signatures.append(('named function', arity))
+        elif query: signatures = [outline, ('anonymous function', arity)]
+        else: signatures = [outline, ('named function', arity)]
+        return signatures
+
+    def outline(self):
+        outline = ('function', len(self.argument_types)) + self.return_type.outline()
+        for argument_type in self.argument_types: outline += argument_type.outline()
+        return outline
+
 class SpecificStructure(namedtuple('SpecificStructure', ['structure', 'constant', 'volatile'])):
     def __new__(self_class, structure, constant = False, volatile = False):
         if not isinstance(structure, Structure): raise TypeError()
@@ -427,8 +618,14 @@ class SpecificStructure(namedtuple('SpecificStructure', ['structure', 'constant'
 
     def same(self, other):
         if type(self) is not type(other): return False
-        if self[1:] is not other[1:]: return False
-        return self.structure.same(other.strurcture)
+        if self[1:] != other[1:]: return False
+        return self.structure.same(other.structure)
+
+    def signatures(self, query = False):
+        return [self[1:] + signature for signature in self.structure.signatures(query)]
+
+    def outline(self):
+        return self[1:] + self.structure.outline()
 
 class Substructure(namedtuple('Substructure', ['structure', 'label', 'offset'])):
     def __new__(self_class, structure, label = '', offset = 0):
@@ -453,6 +650,10 @@ class Substructure(namedtuple('Substructure', ['structure', 'label', 'offset']))
     def size(self):
         return self.structure.structure.size
 
+    @property
+    def size_bounds(self):
+        return self.structure.structure.size_bounds
+
     def description(self):
         return self.structure.description(self.label)
 
@@ -460,244 +661,576 @@ class Substructure(namedtuple('Substructure', ['structure', 'label', 'offset']))
         self.structure.structure.add_possible_size(size)
 
     def remove_possible_sizes_above(self, limit):
-        self.structure.structure.remove_possible_sizes_above(limit)
+        return self.structure.structure.remove_possible_sizes_above(limit)
 
     def remove_possible_sizes_below(self, limit):
-        self.structure.structure.remove_possible_sizes_below(limit)
+        return self.structure.structure.remove_possible_sizes_below(limit)
+
+    @property
+    def shape(self):
+        """
+        Hash of the properties of the substructure that the same substructures share,
+        which is independent of the process unlike the built-in hash.
+        """
+
+        structure = self.structure
+        return crc32(repr((self.label, self.offset, structure.constant, structure.volatile,
+                           structure.structure.kind)).encode())
 
     def same(self, other):
         if type(self) is not type(other): return False
-        if self[1:] is not other[1:]: return False
-        return self.structure.same(other.sturcture)
+        if self[1:] != other[1:]: return False
+        return self.structure.same(other.structure)
+
+class StructureIndex(object):
+    """
+    Hash index of structures by their signatures.
+
+    A structure is stored under its stored signatures and found by its query signatures,
+    the structures sharing a signature are only candidates and compared by their method same.
+    A structure changed after being added has to be added again.
+    Of several candidates the same as a structure the one added first is found.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.signatures = {}
+        self.numbers = {}
+
+    def add(self, structure):
+        key = id(structure)
+        if key not in self.numbers: self.numbers[key] = len(self.numbers)
+        signatures = set(structure.signatures())
+        old_signatures = self.signatures.get(key, set())
+        for signature in old_signatures - signatures: del self.buckets[signature][key]
+        for signature in signatures - old_signatures: self.buckets.setdefault(signature, {})[key] = structure
+        self.signatures[key] = signatures
+
+    def remove(self, structure):
+        key = id(structure)
+        for signature in self.signatures.pop(key, ()): del self.buckets[signature][key]
+
+    def find(self, structure):
+        candidates = {}
+        for signature in structure.signatures(query = True):
+            candidates.update(self.buckets.get(signature, {}))
+
+        for candidate in sorted(candidates.values(), key = lambda candidate: self.numbers[id(candidate)]):
+            if structure.same(candidate): return candidate
+
+def infer_sizes(structures):
+    """
+    Narrow the possible sizes of the given structures and all structures inside of them.
+
+    A data structure is at least as big as the end of its last substructure,
+    a substructure is at most as big as the distance to the following one or to the end
+    and a substructure of a union at most as big as the union, which is at least as big as all of them.
+    Whenever the lower bound of a size rises, the data structures whose lower bound depends on it are visited again,
+    whenever the upper bound falls, the structure itself is, until no bound changes anymore.
+
+    The distances between substructures and the known sizes of unions or their substructures
+    are suggested as sizes, which decide between the remaining possible sizes.
+    """
+
+    # the data structures whose lower bound depends on the structures sharing each size,
+    # the unions containing them and the other data structures ending with them
+    containers = {}
+    data_structures = []
+    stack = list(structures)
+    seen = set()
+    while stack:
+        structure = stack.pop()
+        if isinstance(structure, Array): structure = structure.cell.structure
+        if id(structure) in seen or not isinstance(structure, Data): continue
+        seen.add(id(structure))
+        if isinstance(structure, Array): continue
+
+        substructures = structure.substructures
+        if not isinstance(structure, DataUnion): substructures = substructures.values()
+        if substructures: data_structures.append(structure)
+        for substructure in substructures:
+            inner_structure = substructure.structure.structure
+            if isinstance(structure, DataUnion) or substructure is substructures[-1]:
+                containers.setdefault(id(inner_structure.size_owner), []).append(structure)
+            stack.append(inner_structure)
+
+    suggested = set()
+
+    def constrain(structure):
+        """
+        Return the pairs of the structures whose bounds changed by the layout of the given data structure
+        and whether it was their lower bound.
+        """
+
+        changed = []
+        lower, upper = structure.size_bounds
+
+        if isinstance(structure, DataUnion):
+            substructures = structure.substructures
+            if upper is not None:
+                changed.extend((substructure, False) for substructure in substructures
+                               if substructure.remove_possible_sizes_above(upper))
+            if structure.remove_possible_sizes_below(max(substructure.size_bounds[0] for substructure in substructures)):
+                changed.append((structure, True))
+
+            if (id(structure), 1) not in suggested:
+                if structure.size_known:
+                    for substructure in substructures:
+                        if not substructure.size_known: substructure.add_possible_size(structure.size)
+                    suggested.add((id(structure), 1))
+                elif all(substructure.size_known for substructure in substructures):
+                    structure.add_possible_size(max(substructure.size for substructure in substructures))
+                    suggested.add((id(structure), 1))
+            return changed
+
+        substructures = structure.substructures.values()
+        for substructure, following in zip(substructures, substructures[1:]):
+            if substructure.remove_possible_sizes_above(following.offset - substructure.offset):
+                changed.append((substructure, False))
+
+        last = substructures[-1]
+        if structure.remove_possible_sizes_below(last.offset + last.size_bounds[0]): changed.append((structure, True))
+        if upper is not None and last.remove_possible_sizes_above(upper - last.offset): changed.append((last, False))
+
+        if (id(structure), 0) not in suggested:
+            for substructure, following in zip(substructures, substructures[1:]):
+                if not substructure.size_known: substructure.add_possible_size(following.offset - substructure.offset)
+            suggested.add((id(structure), 0))
+        if (id(structure), 1) not in suggested and structure.size_known:
+            if not last.size_known: last.add_possible_size(structure.size - last.offset)
+            suggested.add((id(structure), 1))
+        return changed
+
+    # each data structure is visited once, then again after a bound it depends on changed
+    worklist = deque(data_structures)
+    waiting = set(map(id, data_structures))
+    while worklist:
+        structure = worklist.popleft()
+        waiting.discard(id(structure))
+        for changed, lower_changed in constrain(structure):
+            if isinstance(changed, Substructure): changed = changed.structure.structure
+            owner = changed.size_owner
+            # a known size is suggested to the substructures and suggested by those of unions
+            known = changed.size_known
+            neighbours = containers.get(id(owner), []) if lower_changed or known else []
+            if (not lower_changed or known) and isinstance(owner, Data) and id(owner) in seen and owner.substructures:
+                neighbours = neighbours + [owner]
+            for neighbour in neighbours:
+                if id(neighbour) not in waiting:
+                    waiting.add(id(neighbour))
+                    worklist.append(neighbour)
+
+Token = namedtuple('Token', ['kind', 'text', 'start', 'depth'])
+
+separators = ';&$%?#@'
+brackets = { '<' : '>', '(' : ')', '[' : ']' }
+token_expression = re.compile(r'(?P<space>[^\S\n]+)|(?P<newline>\n)|(?P<word>[^\s;&$%?#@,<>()\[\]*]+)|(?P<symbol>.)')
+
+class StructuresSyntax(object):
+    """
+    Single pass tokenizer for the content of a structures file.
+
+    Each line describes a data structure by fields separated by commas.
+    It is followed by its substructures, each introduced by the separator of its depth,
+    ';' for the substructures of the line, '&' for theirs and so on.
+    Separators and commas inside of brackets do not count.
+    """
+
+    def __init__(self, string):
+        self.string = string
+        self.line_starts = [0] + [match.end() for match in re.finditer('\n', string)]
+        self.tokens = self.tokenize()
+
+    def error(self, message, position):
+        """
+        Return an error for the given message at the given position of the string.
+        """
+
+        line = bisect(self.line_starts, position)
+        column = position - self.line_starts[line - 1] + 1
+        return ValueError('line {:d}, column {:d}: {}'.format(line, column, message))
+
+    def tokenize(self):
+        """
+        Return the list of tokens of the string.
+
+        Tokens are words, brackets, stars, ampersands, commas, separators and line ends,
+        each with its position and the number of brackets it is inside of.
+        """
+
+        tokens = []
+        openings = []
+        for match in token_expression.finditer(self.string):
+            kind = match.lastgroup
+            if kind == 'word':
+                tokens.append(Token(kind, match.group(), match.start(), len(openings)))
+                continue
+            if kind == 'space': continue
+            text, start = match.group(), match.start()
+
+            if kind == 'newline':
+                if openings: raise self.error("unclosed '{}'".format(openings[-1].text), openings[-1].start)
+            elif kind == 'symbol':
+                if text in brackets:
+                    kind = 'open'
+                    openings.append(Token(kind, text, start, len(openings)))
+                    tokens.append(openings[-1])
+                    continue
+                elif text in brackets.values():
+                    if not openings or brackets[openings[-1].text] != text:
+                        raise self.error("unexpected '{}'".format(text), start)
+                    openings.pop()
+                    kind = 'close'
+                elif text == ',': kind = 'comma'
+                elif text == '*': kind = 'star'
+                elif text == '&' and openings: kind = 'ampersand'
+                elif text in separators and not openings: kind = 'separator'
+                else: kind = 'word'
+            tokens.append(Token(kind, text, start, len(openings)))
+
+        if openings: raise self.error("unclosed '{}'".format(openings[-1].text), openings[-1].start)
+        return tokens
+
+    def lines(self):
+        """
+        Generate the data structures of the lines as trees of nodes, each a triple of
+        the list of its fields, the lists of their tokens, the list of its children and its position.
+        """
+
+        stack = []
+        for token in self.tokens:
+            if token.kind == 'newline':
+                if stack: yield stack[0]
+                stack = []
+                continue
+            if not stack: stack.append(([[]], [], token.start))
+
+            if token.kind == 'separator':
+                depth = separators.index(token.text)
+                if depth >= len(stack): raise self.error("unexpected separator '{}'".format(token.text), token.start)
+                del stack[depth + 1:]
+                node = ([[]], [], token.start + 1)
+                stack[-1][1].append(node)
+                stack.append(node)
+            elif token.kind == 'comma' and not token.depth: stack[-1][0].append([])
+            else: stack[-1][0][-1].append(token)
+        if stack: yield stack[0]
+
+    def text(self, tokens):
+        if not tokens: return ''
+        last = tokens[-1]
+        return self.string[tokens[0].start : last.start + len(last.text)]
 
 def parse_structures_recursive(string):
+    """
+    Return the dictionary from names to data structures described in the content of a structures file.
+
+    Raise a ValueError with the position of the first syntax error.
+    """
+
     if string is None: return {}
-    separators = ';&$%?#@'
+    syntax = StructuresSyntax(string)
+    error = syntax.error
     data_structures = {}
-    functions = []
-    pointers = []
+    data_index, function_index, pointer_index = StructureIndex(), StructureIndex(), StructureIndex()
 
-    def lookup_data_structure(structure):
+    def add_data_structure(structure, name = None):
+        data_structures[structure.name if name is None else name] = structure
+        data_index.add(structure)
+
+    def lookup_data_structure(structure, position):
         assert isinstance(structure, Data)
         if structure.name in data_structures:
             lookup_structure = data_structures[structure.name]
-            assert structure.same(lookup_structure)
+            if not structure.same(lookup_structure):
+                raise error('conflicting definitions of {}'.format(structure.name), position)
             return lookup_structure
 
-    def lookup_structure(structure, structure_list):
-        assert isinstance(structure, Structure)
-        for other_structure in structure_list:
-            if structure.same(other_structure):
-                return other_structure
-
     def update_structure(structure, other_structure):
         assert isinstance(structure, Data)
-        assert structure.same(other_structure)
         if '#' in structure.name and '#' not in other_structure.name:
             structure.name = other_structure.name
+            data_structures[structure.name] = structure
+            data_index.add(structure)
         if not isinstance(structure, type(other_structure)):
-            assert isinstance(other_structure, type(structure))
             new_structure = type(other_structure)(structure.name)
             new_structure.substructures = structure.substructures
+            new_structure.shape = structure.shape
             new_structure.presize = structure.presize
             new_structure.size_known = structure.size_known
-            data_structures[new_structure.name] = new_structure
+            add_data_structure(new_structure)
             return new_structure
         return structure
 
-    def parse_fields(fields, delimiter = ','):
-        imbalance = { '<>' : 0, '()' : 0 }
-        field = []
-
-        for char in fields:
-            if not any(imbalance.values()) and char == delimiter:
-                yield ''.join(field).strip()
-                field = []
+    def parse_pointers(tokens, structure, known):
+        """
+        Return the pointers to the given structure given by the tokens following its first star.
+        """
+
+        qualifiers = []
+        for token in tokens + [None]:
+            if token is not None and token.kind != 'star':
+                if token.kind != 'word' or token.text not in ('const', 'volatile'):
+                    raise error("unexpected '{}' in pointer".format(token.text), token.start)
+                qualifiers.append(token.text)
                 continue
 
-            elif char == '<':
-                imbalance['<>'] += 1
-            elif char == '>':
-                imbalance['<>'] -= 1
-            elif char == '(':
-                imbalance['()'] += 1
-            elif char == ')':
-                imbalance['()'] -= 1
-            field.append(char)
-
-        if field and not any(imbalance.values()): yield ''.join(field).strip()
-
-    def parse_keyword(name, keyword):
-        if not name: return False, name
-
-        name = name.strip()
-        partitions = name.partition(keyword)
-        if not partitions[1]: return False, name
-
-        if partitions[0]:
-            preceding  = partitions[0][-1]
-            if not  preceding.isspace(): return False, name
-        if partitions[2]:
-            succeeding = partitions[-1][0]
-            if not succeeding.isspace(): return False, name
-
-        return True, (partitions[0].strip() + ' ' + partitions[2].strip()).strip()
-
-    def parse_specific_pointer(pointer_partition, structure, known):
-        while pointer_partition[1]:
-            pointer_partition = pointer_partition[2].partition('*')
-            constant, keywords = parse_keyword(pointer_partition[0], 'const')
-            volatile, keywords = parse_keyword(keywords, 'volatile')
-            assert not keywords
-
             pointer = Pointer(structure)
-            lookup = lookup_structure(pointer, pointers)
+            lookup = pointer_index.find(pointer)
             if not lookup:
-                pointers.append(pointer)
+                pointer_index.add(pointer)
                 known = False
             else: pointer, known = lookup, True
-            structure = SpecificStructure(pointer, constant, volatile)
+            structure = SpecificStructure(pointer, 'const' in qualifiers, 'volatile' in qualifiers)
+            qualifiers = []
         return structure, known
 
-    def parse_specific_structure(field):
-        if field == 'void': return SpecificStructure(void)
-
-        pointer_partition = field.partition('*')
-
-        constant, name = parse_keyword(pointer_partition[0], 'const')
-        volatile, name = parse_keyword(name, 'volatile')
+    def parse_specific_structure(tokens, depth, position):
+        """
+        Return the structure given by the tokens of a type without function
+        and whether it was known before.
+        """
+
+        star = next((index for index, token in enumerate(tokens)
+                     if token.kind == 'star' and token.depth == depth), len(tokens))
+
+        # the words of the name without keywords,
+        # brackets belong to the preceding word, e.g. the arguments of a template
+        qualifiers, names = set(), []
+        attached = False
+        for token in tokens[:star]:
+            if token.depth > depth or token.kind == 'close': names[-1].append(token)
+            elif token.kind == 'word' and token.text in ('const', 'volatile', 'enum', 'struct', 'union', 'class'):
+                qualifiers.add(token.text)
+                attached = False
+            elif token.kind == 'word' or token.kind == 'open' and not attached:
+                names.append([token])
+                attached = True
+            elif token.kind == 'open': names[-1].append(token)
+            else: raise error("unexpected '{}' in type".format(token.text), token.start)
+        name = ' '.join(syntax.text(tokens) for tokens in names)
+
+        kinds = qualifiers & { 'enum', 'struct', 'union', 'class' }
+        if len(kinds) > 1:
+            raise error('conflicting keywords {}'.format(' '.join(sorted(kinds))), position)
+
+        if name == 'void' and not kinds:
+            structure, known = void, True
+        else:
+            if   'enum'   in kinds: structure = DataEnumeration(name)
+            elif 'struct' in kinds: structure = DataStructure(name)
+            elif 'union'  in kinds: structure = DataUnion(name)
+            elif 'class'  in kinds: structure = DataClass(name)
+            else:                   structure = Data(name)
 
-        is_enumeration, name = parse_keyword(name, 'enum')
-        is_structure,   name = parse_keyword(name, 'struct')
-        is_union,       name = parse_keyword(name, 'union')
-        is_class,       name = parse_keyword(name, 'class')
+            lookup = lookup_data_structure(structure, position)
+            if not lookup:
+                add_data_structure(structure)
+                known = False
+            else:
+                structure = update_structure(lookup, structure)
+                known = True
 
-        if not (is_enumeration or is_structure or is_union or is_class):
-            structure = Data(name)
-        elif is_enumeration and not (is_structure or is_union):
-            structure = DataEnumeration(name)
-        elif is_structure and not (is_enumeration or is_union or is_class):
-            structure = DataStructure(name)
-        elif is_union and not (is_enumeration or is_structure or is_class):
-            structure = DataUnion(name)
-        elif is_class and not (is_enumeration or is_structure or is_union):
-            structure = DataClass(name)
-        else: assert False
+        structure = SpecificStructure(structure, 'const' in qualifiers, 'volatile' in qualifiers)
+        if star == len(tokens): return structure, known
+        return parse_pointers(tokens[star + 1:], structure, known)
 
-        lookup = lookup_data_structure(structure)
-        if not lookup:
-            data_structures[structure.name] = structure
-            known = False
-        else:
-            structure = update_structure(lookup, structure)
-            known = True
+    def parse_general_structure(tokens, depth, position):
+        """
+        Return the structure given by the tokens of a type
+        and whether it was known before.
 
-        structure = SpecificStructure(structure, constant, volatile)
-        return parse_specific_pointer(pointer_partition, structure, known)
+        A function pointer is written as 'RETURN_TYPE ()(ARGUMENTS) *'.
+        """
 
-    def parse_general_structure(field):
-        function_partition = field.partition('()')
-        structure, known = parse_specific_structure(function_partition[0])
+        marker = next((index for index, token in enumerate(tokens[:-1])
+                       if token.depth == depth and token.text == '(' and tokens[index + 1].text == ')'), None)
+        if marker is None: return parse_specific_structure(tokens, depth, position)
 
-        if not function_partition[1]: return structure, known
+        return_type, known = parse_specific_structure(tokens[:marker], depth, position)
+        if return_type.constant or return_type.volatile:
+            raise error('qualified return type of function', position)
 
-        return_type, constant, volatile = structure
-        assert constant == volatile == False
+        rest = tokens[marker + 2:]
+        if not rest or rest[0].text != '(':
+            raise error("expected '(' with the arguments of the function", rest[0].start if rest else tokens[marker].start)
+        end = next(index for index, token in enumerate(rest) if token.depth == depth and token.text == ')')
 
-        function_partition = function_partition[2].partition('(')
-        assert function_partition[1]
-        function_partition = function_partition[2].partition(')')
-        assert function_partition[1]
+        function = Function(return_type.structure)
+        arguments = [[]]
+        for token in rest[1:end]:
+            if token.kind == 'comma' and token.depth == depth + 1: arguments.append([])
+            else: arguments[-1].append(token)
 
-        function = Function(return_type)
-        arguments = parse_fields(function_partition[0])
         for argument in arguments:
-            if argument == 'void': break
-
-            reference_partition = argument.partition('&')
-            structure = parse_general_structure(reference_partition[0])[0]
-            if reference_partition[1]:
-                assert not reference_partition[2]
-                structure = SpecificStructure(Reference(structure))
+            if not argument: continue
+            if len(argument) == 1 and argument[0].text == 'void': break
+
+            reference = next((index for index, token in enumerate(argument)
+                              if token.kind == 'ampersand' and token.depth == depth + 1), None)
+            if reference is not None and reference + 1 < len(argument):
+                raise error("unexpected '{}' after reference".format(argument[reference + 1].text),
+                            argument[reference + 1].start)
+            structure = parse_general_structure(argument[:reference], depth + 1, argument[0].start)[0]
+            if reference is not None: structure = SpecificStructure(Reference(structure))
             function.add_argument_type(structure)
 
-        lookup = lookup_structure(function, functions)
+        lookup = function_index.find(function)
         if not lookup:
-            functions.append(function)
+            function_index.add(function)
             known = False
         else: function, known = lookup, True
 
-        pointer_partition = function_partition[2].strip().partition('*')
-        assert not pointer_partition[0] and pointer_partition[1]
-        return parse_specific_pointer(pointer_partition, function, known)
-
-    def parse_structure(line, depth = 0, substructure = False):
-        line = line.strip()
-        try: segments = list(parse_fields(line, separators[depth]))
-        except IndexError: segments = [line]
-
-        fields = tuple(parse_fields(segments[0]))
-
-        if not substructure: 
-            structure = Data(fields[0])
-            lookup = lookup_data_structure(structure)
-            if not lookup:
-                for segment in segments[1:]:
-                    structure.add_substructure(parse_structure(segment, depth + 1, True))
-                    lookup = lookup_structure(structure, data_structures.values())
-                    if lookup: lookup = update_structure(lookup, structure)
-            if lookup: structure = lookup
-            else: data_structures[structure.name] = structure
+        pointers = rest[end + 1:]
+        if not pointers or pointers[0].kind != 'star':
+            raise error('expected a pointer to the function', pointers[0].start if pointers else rest[end].start)
+        return parse_pointers(pointers[1:], SpecificStructure(function), known)
 
-            try: structure.size = int(fields[1])
-            except (IndexError, ValueError): pass
+    def parse_integer(tokens):
+        try: return int(syntax.text(tokens))
+        except ValueError: return None
 
-            return
+    def parse_substructure(node):
+        fields, children, position = node
 
-        structure, known = parse_general_structure(fields[0])
+        structure, known = parse_general_structure(fields[0], 0, position)
 
         if not known:
-            try:
-                for segment in segments[1:]:
-                    structure.structure.add_substructure(parse_structure(segment, depth + 1, True))
-            except AttributeError: assert False
+            if children and not isinstance(structure.structure, Data):
+                raise error('substructures of {}'.format(structure.description()), position)
+            for child in children: add_substructure(structure.structure, child)
 
+            # the structure was added before its substructures were known,
+            # it is only kept in the index if it is not the same as a structure added before
             if isinstance(structure.structure, Data):
-                lookup = lookup_structure(structure.structure, data_structures.values())
-                if lookup: lookup = update_structure(lookup, structure.structure)
-
-                if known or lookup: structure = SpecificStructure(lookup, *structure[1:])
-                else: data_structures[structure.structure.name] = structure.structure
-
-        try:
-            label = fields[1]
-            array_partition = label.partition('[')
+                data_index.add(structure.structure)
+                lookup = data_index.find(structure.structure)
+                if lookup is not structure.structure:
+                    data_index.remove(structure.structure)
+                    if '#' in structure.structure.name: del data_structures[structure.structure.name]
+                    structure = SpecificStructure(update_structure(lookup, structure.structure), *structure[1:])
+
+        label = None
+        if len(fields) > 1:
+            label_tokens = fields[1]
+            opening = next((index for index, token in enumerate(label_tokens) if token.text == '['), None)
+            label = syntax.text(label_tokens[:opening])
+
+            if opening is not None:
+                closing = next(index for index, token in enumerate(label_tokens) if token.text == ']')
+                if closing + 1 < len(label_tokens):
+                    raise error("unexpected '{}' after array size".format(label_tokens[closing + 1].text),
+                                label_tokens[closing + 1].start)
+
+                count = parse_integer(label_tokens[opening + 1 : closing]) or 0
+                array = Array(structure, count)
+                if not lookup_data_structure(array, label_tokens[opening].start): add_data_structure(array, array.full_name)
+                structure = SpecificStructure(array)
 
-            if array_partition[1]:
-                label = array_partition[0].strip()
+        if len(fields) > 3: set_size(structure.structure, fields[3])
 
-                array_partition = array_partition[2].partition(']')
-                assert array_partition[1] and not array_partition[2]
+        offset = parse_integer(fields[2]) if len(fields) > 2 else None
+        if offset is None: return Substructure(structure, label)
+        return Substructure(structure, label, offset)
 
-                try: count = int(array_partition[0])
-                except ValueError: count = 0
+    def add_substructure(structure, node):
+        substructure = parse_substructure(node)
+        offset, position = substructure.offset, node[2]
 
-                array = Array(structure, count)
-                lookup = lookup_data_structure(array)
-                if not lookup: data_structures[array.full_name] = array
+        if isinstance(structure, DataUnion):
+            if offset: raise error('substructure of union at offset {:d}'.format(offset), position)
+        elif offset in structure.substructures:
+            raise error('two substructures at offset {:d}'.format(offset), position)
+        else:
+            following = structure.substructures.bisect(offset)
+            if following:
+                preceding = structure.substructures.values()[following - 1]
+                if preceding.size_known and preceding.offset + preceding.size > offset:
+                    raise error('substructure at offset {:d} overlaps the one at offset {:d}'.format(
+                                    offset, preceding.offset), position)
+
+            if following < len(structure.substructures): limit = structure.substructures.keys()[following]
+            elif structure.size_known: limit = structure.size
+            else: limit = None
+            if substructure.size_known and limit is not None and offset + substructure.size > limit:
+                raise error('substructure at offset {:d} overlaps the following one or the end'.format(offset), position)
+        structure.add_substructure(substructure)
+
+    def set_size(structure, tokens):
+        size = parse_integer(tokens)
+        if size is None: return
+        if structure.size_known and structure.size != size:
+            raise error('size {:d} conflicts with size {:d} of {}'.format(size, structure.size, structure.description()),
+                        tokens[0].start)
+        structure.size = size
+
+        # the substructures were added before the size was known
+        if isinstance(structure, DataUnion): ends = [(substructure.size, 0) for substructure in structure.substructures
+                                                     if substructure.size_known]
+        elif isinstance(structure, Data) and structure.substructures:
+            last = structure.substructures.peekitem()[1]
+            ends = [(last.offset + last.size, last.offset)] if last.size_known else []
+        else: ends = []
+        for end, offset in ends:
+            if end > size: raise error('substructure at offset {:d} overlaps the end'.format(offset), tokens[0].start)
+
+    def parse_structure(node):
+        fields, children, position = node
+        structure = Data(syntax.text(fields[0]))
+        lookup = lookup_data_structure(structure, position)
 
-                structure = SpecificStructure(array)
-        except IndexError: label = None
+        if not lookup:
+            for child in children: add_substructure(structure, child)
+            lookup = data_index.find(structure)
+            if lookup: lookup = update_structure(lookup, structure)
+        if lookup: structure = lookup
+        else: add_data_structure(structure)
 
-        try: structure.structure.size = int(fields[3])
-        except (IndexError, ValueError): pass
+        if len(fields) > 1: set_size(structure, fields[1])
 
-        try: return Substructure(structure, label, int(fields[2]))
-        except (IndexError, ValueError):
-            return Substructure(structure, label)
+    for node in syntax.lines(): parse_structure(node)
 
-    lines = string.strip().split('\n')
-    for line in lines: parse_structure(line)
+    infer_sizes(data_structures.values())
+    return data_structures
 
-    for structure in data_structures.values(): structure.annotate_size()
+# version of the stored data structures, increase on incompatible changes
+version = 3
+
+# the sizes of pointers and references are shared by all of them
+pointer_classes = (Pointer, Reference)
+pointer_attributes = ('pointer_size', 'pointer_size_known')
+
+def save_structures(data_structures, directory):
+    """
+    Store the dictionary from names to data structures in the given directory.
+
+    Structures shared by several others are stored once and stay shared when loaded.
+    """
+
+    pointer_sizes = [{ name : value for name, value in vars(pointer_class).items() if name in pointer_attributes }
+                     for pointer_class in pointer_classes]
+    with open(path.join(directory, 'structures.pickle'), 'wb') as structures_file:
+        pickle.dump((identifier, pointer_sizes, data_structures), structures_file, pickle.HIGHEST_PROTOCOL)
+
+def load_structures(directory):
+    """
+    Return the dictionary from names to data structures stored in the given directory.
+    """
+
+    global identifier
+    # the garbage collector would go through all objects again and again while they are created
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path.join(directory, 'structures.pickle'), 'rb') as structures_file:
+            stored_identifier, pointer_sizes, data_structures = pickle.load(structures_file)
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as error:
+        raise ValueError('load_structures: invalid stored structures') from error
+    finally:
+        if collecting: gc.enable()
+
+    # anonymous structures created later must not get the names of the loaded ones
+    identifier = max(identifier, stored_identifier)
+    for pointer_class, sizes in zip(pointer_classes, pointer_sizes):
+        for name, value in sizes.items(): setattr(pointer_class, name, value)
     return data_structures
@@ -0,0 +1,147 @@
+from os import path
+
+import numpy
+
+from elf import Symbol
+
+class SymbolTable(object):
+    """
+    Compact table of the symbols of a binary sorted by address.
+
+    The table consists of the arrays:
+      addresses    - unsigned start address of each symbol
+      sizes        - size of each symbol, negative if unknown
+      name_offsets - offsets of the names in the name bytes, one more than symbols
+      names        - utf8 encoded names of all symbols one after the other
+    So it can be stored and memory-mapped again without building any Python objects.
+    The names are kept as found in the binary, e.g. mangled.
+    """
+
+    # version of the stored format, increase on incompatible changes
+    version = 1
+    arrays = ('addresses', 'sizes', 'name_offsets', 'names')
+
+    def __init__(self, addresses, sizes, name_offsets, names):
+        self.addresses = addresses
+        self.sizes = sizes
+        self.name_offsets = name_offsets
+        self.names = names
+
+    @classmethod
+    def from_symbols(self_class, symbols):
+        """
+        Return the table of the given address-symbol-pairs.
+
+        Of several symbols at the same address the last one by name is kept,
+        just like in the sorted output of 'nm'.
+        """
+
+        by_address = {}
+        for address, symbol in sorted(symbols, key = lambda pair: pair[1].name): by_address[address] = symbol
+        addresses = sorted(by_address)
+
+        encoded = [by_address[address].name.encode('utf8') for address in addresses]
+        sizes = [-1 if by_address[address].size is None else by_address[address].size for address in addresses]
+
+        return self_class(numpy.array(addresses, numpy.uint64), numpy.array(sizes, numpy.int64),
+                          numpy.cumsum([0] + list(map(len, encoded)), dtype = numpy.int64),
+                          numpy.frombuffer(b''.join(encoded), numpy.uint8))
+
+    def save(self, directory):
+        """
+        Store the arrays of the table as separate files in the given directory.
+        """
+
+        for name in SymbolTable.arrays:
+            numpy.save(path.join(directory, name + '.npy'), getattr(self, name))
+
+    @classmethod
+    def load(self_class, directory):
+        """
+        Return the table stored in the given directory.
+
+        The arrays are memory-mapped instead of read.
+        """
+
+        return self_class(*(numpy.load(path.join(directory, name + '.npy'), mmap_mode = 'r')
+                            for name in SymbolTable.arrays))
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def keys(self):
+        return self.addresses.tolist()
+
+    def name(self, index):
+        """
+        Return the name of the symbol with the given index.
+        """
+
+        if index < 0: index += len(self)
+        lower, upper = int(self.name_offsets[index]), int(self.name_offsets[index + 1])
+        return self.names[lower:upper].tobytes().decode('utf8', 'replace')
+
+    def symbol(self, index):
+        """
+        Return the symbol with the given index.
+        """
+
+        size = int(self.sizes[index])
+        return Symbol(self.name(index), None if size < 0 else size)
+
+    def items(self):
+        """
+        Return an iterator over the address-symbol-pairs in the order of the addresses.
+        """
+
+        return ((address, self.symbol(index)) for index, address in enumerate(self.addresses.tolist()))
+
+    @classmethod
+    def merge(self_class, tables, bases):
+        """
+        Return the table combining the given tables of binaries loaded at the given base addresses.
+
+        Each binary ends after its last symbol with a known size.
+        There an unnamed symbol is added, so addresses between the binaries
+        are not attributed to the last symbol of the binary before.
+        Of several symbols at the same address the one of the last binary is kept.
+        """
+
+        addresses, sizes, name_starts, name_ends, names = [], [], [], [], []
+        name_offset = 0
+        for table, base in zip(tables, bases):
+            table_addresses = numpy.asarray(table.addresses, numpy.uint64) + numpy.uint64(base)
+            table_sizes = numpy.asarray(table.sizes)
+            addresses.append(table_addresses)
+            sizes.append(table_sizes)
+            name_starts.append(numpy.asarray(table.name_offsets[:-1]) + name_offset)
+            name_ends.append(numpy.asarray(table.name_offsets[1:]) + name_offset)
+            names.append(numpy.asarray(table.names))
+            name_offset += len(table.names)
+
+            known = table_sizes > 0
+            if known.any():
+                end = (table_addresses[known] + table_sizes[known].astype(numpy.uint64)).max()
+                if end > table_addresses.max():
+                    addresses.append(numpy.array([end], numpy.uint64))
+                    sizes.append(numpy.array([-1], numpy.int64))
+                    name_starts.append(numpy.zeros(1, numpy.int64))
+                    name_ends.append(numpy.zeros(1, numpy.int64))
+
+        if not addresses: return self_class.from_symbols([])
+        addresses, sizes, name_starts, name_ends = map(numpy.concatenate, (addresses, sizes, name_starts, name_ends))
+        names = numpy.concatenate(names)
+
+        # sort stably by address and keep the last symbol at each address,
+        # the unnamed end of a binary gives way to a symbol of another binary
+        named = name_ends > name_starts
+        order = numpy.lexsort((named, addresses))
+        sorted_addresses = addresses[order]
+        order = order[numpy.append(sorted_addresses[1:] != sorted_addresses[:-1], True)]
+
+        # gather the names of the kept symbols into one array
+        lengths = name_ends[order] - name_starts[order]
+        name_offsets = numpy.append(0, numpy.cumsum(lengths))
+        gather = numpy.repeat(name_starts[order] - name_offsets[:-1], lengths) + numpy.arange(name_offsets[-1])
+
+        return self_class(addresses[order], sizes[order], name_offsets, names[gather])
@@ -0,0 +1,74 @@
+import unittest
+from os import path
+from shutil import which
+from subprocess import run
+from tempfile import TemporaryDirectory
+
+from grouping import Interval
+from process_data import (Memory, create_memory_labels, generate_clusters, parse_structures_recursive,
+                          read_debug_structures, read_memory_usage)
+
+def label_memory(text, usage, addresses):
+    structures = parse_structures_recursive(text)
+    positions = iter(sorted(address * Memory.bits for address in addresses))
+    return create_memory_labels(generate_clusters(positions), usage, structures)
+
+def headers(group):
+    chain = []
+    while group is not None:
+        chain.append(group.header)
+        group = group.parent
+    return chain
+
+class UnionLabelsTest(unittest.TestCase):
+    usage = [(Interval(0x1000 * Memory.bits, 8 * Memory.bits, True), 'v')]
+
+    def test_clusters_after_union(self):
+        for text in ('v,8;union u,,0,8&long,a,0,8&long,b,0,8\n', 'v,8;struct u,,0,8&long,a,0,8\n'):
+            labels = label_memory(text, self.usage, [0x1000, 0x2000, 0x3000])
+            self.assertEqual([interval.lower // Memory.bits for interval in labels], [0x1000, 0x2000, 0x3000])
+
+    def test_members_smaller_than_union(self):
+        labels = label_memory('v,8;union u,,0,8&char,c,0,1&long,l,0,8\n', self.usage, [0x1000, 0x1003, 0x3000])
+        self.assertEqual([interval.lower // Memory.bits for interval in labels], [0x1000, 0x1003, 0x3000])
+
+        # each member is only labelled inside of its own span
+        choice = labels.peekitem(0)[1].parent
+        character, long = choice.subgroups[1:]
+        self.assertEqual([headers(group) for group in character.values()], [['+ 0x0', 'char c', 'union u ', 'v']])
+        self.assertEqual([headers(group) for group in long.values()],
+                         [['+ 0x0', 'long l', 'union u ', 'v'], ['+ 0x3', 'long l', 'union u ', 'v']])
+
+union_source = '''
+union value { char c; short s; long l; int a[4]; };
+struct holder { int before; union value v; long after; };
+union value global_union = { .l = 1 };
+struct holder global_holder = { 1 };
+long global_after = 2;
+int main(void) { return global_union.c + global_holder.before + (int) global_after; }
+'''
+
+@unittest.skipIf(which('gcc') is None, 'needs gcc to build the binary')
+class BinaryLabelsTest(unittest.TestCase):
+    def test_variables_of_binary_with_unions(self):
+        with TemporaryDirectory() as directory:
+            source, binary = path.join(directory, 'union.c'), path.join(directory, 'union')
+            with open(source, 'w') as source_file: source_file.write(union_source)
+            run(['gcc', '-g', '-O0', '-o', binary, source], check = True)
+
+            binaries = [(binary, 0)]
+            structures = read_debug_structures(binaries)
+            usage = read_memory_usage(binaries, structures)
+            lowers = { name : interval.lower // Memory.bits for interval, name in usage }
+
+            addresses = [lowers['global_union'], lowers['global_union'] + 12,
+                         lowers['global_holder'] + 20, lowers['global_after']]
+            positions = iter(sorted(address * Memory.bits for address in addresses))
+            labels = create_memory_labels(generate_clusters(positions), usage, structures)
+
+        self.assertEqual([interval.lower // Memory.bits for interval in labels], addresses)
+        self.assertEqual([headers(group)[-1] for group in labels.values()],
+                         ['global_union', 'global_union', 'global_holder', 'global_after'])
+        self.assertIn('union value v', headers(labels.peekitem(2)[1]))
+
+if __name__ == '__main__': unittest.main()